@@ -1,7 +1,44 @@
+import asyncio, threading
+from concurrent.futures import Future
 from typing import Union
 
 
 class Database:
     # queries database using key-values assignments and returns list of results
     def query(self, query: {str: Union[str,int,float]}) -> [object]:
-        raise NotImplementedError('Database has to implement the query method.')
\ No newline at end of file
+        raise NotImplementedError('Database has to implement the query method.')
+
+
+class AsyncDatabase:
+    # asynchronously queries database using key-values assignments and returns list of results
+    async def query(self, query: {str: Union[str,int,float]}) -> [object]:
+        raise NotImplementedError('AsyncDatabase has to implement the query method.')
+
+    # runs several queries concurrently and returns their results in the same order
+    async def query_many(self, queries: [{str: Union[str,int,float]}]) -> [[object]]:
+        return await asyncio.gather(*[self.query(query) for query in queries])
+
+
+# event loop in a background thread that runs AsyncDatabase coroutines for
+# synchronous callers such as the Manager
+class AsyncRunner:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="AsyncRunner", daemon=True)
+        self.thread.start()
+
+    # schedules the coroutine on the loop, cancelling the returned future cancels the coroutine
+    def submit(self, coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def async_runner() -> AsyncRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncRunner()
+    return _runner
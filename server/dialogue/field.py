@@ -1,8 +1,11 @@
 from collections import namedtuple, defaultdict
+from typing import Union, List
 import numpy as np
 
 from math import log
 
+from dialogue.table import Column, Table, BitmapIndex
+
 
 def select(selector_path):
     def sel(raw_entry: object) -> object:
@@ -23,7 +26,7 @@ class Field:
                  score: float = 1,
                  default_value: object = None):
         self.name = name
-        self.data = []
+        self.index = BitmapIndex({}, 0)  # categories of the database results, see update()
         self.categorizer = categorizer
         if isinstance(selector, list):
             self.selector = select(selector)
@@ -59,23 +62,20 @@ class Field:
         categories = self.categorize(selected)
         return categories, selected
 
-    # updates self.data with only the field's column and filter raw_data
-    # by returning a bool array
-    # TODO revise so that we can filter Manager.possible_values using selected categories
-    def update(self, raw_data: [object]) -> [bool]:
-        result = []
-        self.data.clear()
-        for entry in raw_data:
-            f = self.filter(entry)
-            if f is None:
-                result.append(False)
-            else:
-                result.append(True)
-                self.data.append(f)
+    # rebuilds the category bitmap index over the database results the possible
+    # data is selected from
+    def update(self, table: Table):
+        self.index = BitmapIndex.from_column(table.column(self.name), len(table))
 
-        return result
+    # dictionary-encoded categories of all entries, see Table
+    def column(self, raw_data: [object]) -> Column:
+        return Column.encode([self.filter(entry)[0] for entry in raw_data])
 
-    def category_count(self, raw_data: [object]) -> {str: int}:
+    def category_count(self, raw_data: Union[Table, List[object]]) -> {str: int}:
+        if isinstance(raw_data, Table):
+            column = raw_data.column(self.name)
+            counts = column.counts()
+            return {column.categories[code]: int(count) for code, count in enumerate(counts) if count > 0}
         attributes = defaultdict(int)
         for entry in raw_data:
             cats, _ = self.filter(entry)
@@ -83,7 +83,11 @@ class Field:
                 attributes[cat] += 1
         return attributes
 
-    def entropy(self, raw_data: [object]) -> float:
+    def entropy(self, raw_data: Union[Table, List[object]]) -> float:
+        if isinstance(raw_data, Table):
+            counts = raw_data.column(self.name).counts()
+            fractions = counts[counts > 0] / len(raw_data)
+            return float(-np.sum(fractions * np.log(fractions))) * self.score
         attributes = self.category_count(raw_data)
         e = 0
         for _, count in attributes.items():
@@ -165,3 +169,12 @@ class NumField(Field):
             if category.lb <= selected <= category.ub:
                 return [category.name]
         return []
+
+    # parses the values once and categorizes them all at once
+    def column(self, raw_data: [object]) -> Column:
+        values = np.array([self.parse_value(self.selector(entry)) for entry in raw_data], dtype=float)
+        codes = np.full(len(values), -1, dtype=np.int64)
+        for code, category in enumerate(self.categories):
+            codes[(codes < 0) & (category.lb <= values) & (values <= category.ub)] = code
+        rows = np.nonzero(codes >= 0)[0]
+        return Column([category.name for category in self.categories], rows, codes[rows], values)
@@ -1,16 +1,26 @@
 from collections import namedtuple
+from concurrent.futures import Executor, ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from itertools import product
 from typing import Union, Generator, Tuple
 from datetime import datetime
 
-import sys
+import sys, time
 
 # from database import Database
 # from field import Field
-from dialogue.database import Database
+from dialogue.database import Database, AsyncDatabase, async_runner
 from dialogue.field import Field
+from dialogue.table import Table, BitmapIndex
 
 MAX_DATA = 2500
 
+# database queries of all sessions share this pool unless a Manager is given its own executor
+QUERY_WORKERS = 8
+query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS)
+
+# seconds to sleep between checks for completed queries
+POLL_INTERVAL = 0.02
+
 
 DialogueTurn = namedtuple("DialogueTurn", ["type", "data", "time"])
 
@@ -18,7 +28,11 @@ DialogueTurn = namedtuple("DialogueTurn", ["type", "data", "time"])
 class Manager:
     # constructs dialogue manager using all available attributes and names of
     # the minimal attributes to generate a query to the knowledge base
-    def __init__(self, available_fields: [Field], minimal_fields: [str], database: Database):
+    def __init__(self,
+                 available_fields: [Field],
+                 minimal_fields: [str],
+                 database: Union[Database, AsyncDatabase],
+                 executor: Executor = query_executor):
         self.available_fields = {}
         for field in available_fields:
             self.available_fields[field.name] = field
@@ -26,12 +40,22 @@ class Manager:
         self.minimal_fields = minimal_fields
         self.user_state = {}  # {str: [(Union[str,int,float], float)]}
         self.database = database
-
-        self.possible_data = []  # [object]
+        self.executor = executor  # runs the queries of a synchronous database
+        # called while waiting for queries, servers with cooperative threads
+        # (e.g. eventlet) replace it to let other sessions run in the meantime
+        self.sleep = time.sleep
+
+        self.table = Table.from_entries([], available_fields)  # columnar view of the possible data
+        self.results = self.table  # unfiltered database results the possible data was selected from
+        self.queried_state = None  # values of the minimal fields self.results holds all results for
         self.asked_questions = set()  # set of field names
 
         self.interaction_sequence = []
 
+    @property
+    def possible_data(self) -> [object]:
+        return self.table.rows
+
     # determines whether the minimal fields have been completed
     def sufficient(self) -> bool:
         for f in self.minimal_fields:
@@ -56,7 +80,7 @@ class Manager:
         for field in fields[1:]:
             if field.name in self.asked_questions:
                 continue
-            entropy = field.entropy(self.possible_data)
+            entropy = field.entropy(self.table)
             if 1e-10 < entropy < best_entropy:
                 best_entropy = entropy
                 best_field = field
@@ -68,7 +92,7 @@ class Manager:
         self.interaction_sequence.append(
             DialogueTurn("question", best_field.name, datetime.now())
         )
-        return best_field, best_field.category_count(self.possible_data)
+        return best_field, best_field.category_count(self.table)
 
     # provides information via attribute name + values with confidence scores
     # returns False, error message if something went wrong
@@ -99,24 +123,27 @@ class Manager:
         self.available_fields[attribute].score *= 1.1 if positive else 0.9
         pass
 
-    def filter_possible(self, raw_data: [object]) -> [object]:
-        filtered = []
-        for data_entry in raw_data:
-            state_agrees = True
-            for key, values in self.user_state.items():
-                categories, _ = self.available_fields[key].filter(data_entry)
-                found_matching_value = False
-                for value, _ in values:
-                    for cat in categories:
-                        if str(value).lower() == str(cat).lower():
-                            found_matching_value = True
-                            break
-                if not found_matching_value:
-                    state_agrees = False
-                    break
-            if state_agrees:
-                filtered.append(data_entry)
-        return filtered
+    # returns the rows of the table that agree with the user state, i.e. the
+    # AND over all attributes of the OR-ed bitsets of their values. The bitmap
+    # indexes of the fields are used if they are built over this table.
+    def filter_possible(self, table: Table, indexed: bool = False) -> Table:
+        bits = None
+        index = None
+        for key, values in self.user_state.items():
+            if indexed:
+                index = self.available_fields[key].index
+            else:
+                index = BitmapIndex.from_column(table.column(key), len(table))
+            matching = index.any_of([value for value, _ in values])
+            bits = matching if bits is None else bits & matching
+        if bits is None:
+            return table
+        return table.take(index.mask(bits))
+
+    # values of the minimal fields, which are the only attributes that change
+    # the database query; all other attributes only filter its results
+    def query_state(self) -> {str: [Union[str, int, float]]}:
+        return {name: [value for value, _ in self.user_state[name]] for name in self.minimal_fields}
 
     # updates and returns number of possible flights
     # returns None if the minimal set of attributes has not been filled so far
@@ -124,49 +151,82 @@ class Manager:
         if not self.sufficient():
             return None
 
-        self.possible_data.clear()
-
-        query_items = self.user_state.items()
-        # keeps track of current index of value to query per attribute
-        open_queries = [(attribute, len(values)-1) for attribute, values in query_items]
-        while all(index >= 0 for _, index in open_queries):
-            query = {}
-            for attribute, index in open_queries:
-                query[attribute] = self.user_state[attribute][index][0]
-            results = self.database.query(query)
-            if results is not None:
-                self.possible_data += self.filter_possible(results)
-
-            if len(self.possible_data) > MAX_DATA:
-                break
-            updated = False
-            for i, (attribute, index) in enumerate(open_queries):
-                if not updated and index > 0:
-                    yield "Querying database with %s = %s..." % (attribute, self.user_state[attribute][index-1][0])
-                    open_queries[i] = attribute, index-1
-                    updated = True
-                    break
-            if not updated:
-                break
+        fields = list(self.available_fields.values())
+        if self.query_state() == self.queried_state:
+            # only filtering attributes changed, select from the results in hand
+            yield "Filtering %i flights..." % len(self.results)
+            self.table = self.filter_possible(self.results, indexed=True)
+        else:
+            yield from self.query(fields)
+            for field in fields:
+                field.update(self.results)
 
         yield "Updating user state with new flights data..."
         self.update_user_state()
+        if self.queried_state is not None:
+            # values removed from the user state have no possible data left,
+            # so the results in hand still cover the remaining values
+            self.queried_state = self.query_state()
 
         return len(self.possible_data)
 
+    # queries the database for every combination of values of the minimal
+    # fields in parallel and selects the possible data from the results
+    def query(self, fields: [Field]) -> Generator[str, None, None]:
+        value_lists = [[value for value, _ in self.user_state[name]] for name in self.minimal_fields]
+        queries = [dict(zip(self.minimal_fields, values)) for values in product(*value_lists)]
+        yield "Querying database with %i combinations of %s..." % (len(queries), ", ".join(self.minimal_fields))
+
+        futures = {self.submit(query): i for i, query in enumerate(queries)}
+        results = [None] * len(queries)
+        tables = [None] * len(queries)
+        possible = 0
+        complete = True
+        for future in self.completed(futures):
+            i = futures[future]
+            entries = future.result()
+            if entries is not None:
+                results[i] = Table.from_entries(entries, fields)
+                tables[i] = self.filter_possible(results[i])
+                possible += len(tables[i])
+            yield "Received %i results for %s..." % (
+                0 if entries is None else len(entries),
+                ", ".join("%s = %s" % item for item in queries[i].items()))
+
+            if possible > MAX_DATA:
+                # queries that are already running cannot be stopped, their results are dropped
+                for pending in futures:
+                    pending.cancel()
+                complete = False
+                break
+
+        # merge in query order so that the possible data does not depend on timing
+        self.results = Table.concat([t for t in results if t is not None], fields)
+        self.table = Table.concat([t for t in tables if t is not None], fields)
+        # results cut off at MAX_DATA cannot be narrowed down without querying again
+        self.queried_state = self.query_state() if complete else None
+
+    # starts a database query in the background
+    def submit(self, query: {str: Union[str, int, float]}) -> Future:
+        if isinstance(self.database, AsyncDatabase):
+            return async_runner().submit(self.database.query(query))
+        return self.executor.submit(self.database.query, query)
+
+    # yields the futures as they complete without blocking in a wait call,
+    # in between self.sleep is called
+    def completed(self, futures: [Future]) -> Generator[Future, None, None]:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+            if len(done) == 0:
+                self.sleep(POLL_INTERVAL)
+            yield from done
+
     # remove values from user state that do not appear in the available flights data
     def update_user_state(self):
         if len(self.possible_data) == 0:
             return
         for key, values in self.user_state.items():
-            existing_values = set()
-            for data_entry in self.possible_data:
-                categories, _ = self.available_fields[key].filter(data_entry)
-                for cat in categories:
-                    existing_values.add(cat)
-            nvalues = []
-            for existing in existing_values:
-                for value, score in values:
-                    if str(existing).lower() == str(value).lower():
-                        nvalues.append((value, score))
-            self.user_state[key] = nvalues
+            existing_values = self.table.column(key).folded_categories()
+            self.user_state[key] = [(value, score) for value, score in values
+                                    if str(value).lower() in existing_values]
@@ -0,0 +1,180 @@
+import numpy as np
+
+
+# Dictionary-encoded categories of one Field over the rows of a Table.
+# Every (row, category) pair is stored in rows/codes, so fields that assign
+# several categories to an entry (e.g. carriers) are encoded the same way as
+# fields with a single category per entry.
+class Column:
+    def __init__(self,
+                 categories: [str],
+                 rows: np.ndarray,
+                 codes: np.ndarray,
+                 values: np.ndarray = None):
+        self.categories = categories
+        self.folded = [category.lower() for category in categories]
+        self.rows = rows
+        self.codes = codes
+        # raw numeric values per row for numeric fields, None otherwise
+        self.values = values
+
+    @staticmethod
+    def encode(row_categories: [[str]], values: np.ndarray = None) -> 'Column':
+        categories = []
+        index = {}
+        rows = []
+        codes = []
+        for row, cats in enumerate(row_categories):
+            for cat in cats:
+                if cat not in index:
+                    index[cat] = len(categories)
+                    categories.append(cat)
+                rows.append(row)
+                codes.append(index[cat])
+        return Column(categories,
+                      np.array(rows, dtype=np.int64),
+                      np.array(codes, dtype=np.int64),
+                      values)
+
+    # number of rows per category code
+    def counts(self) -> np.ndarray:
+        return np.bincount(self.codes, minlength=len(self.categories))
+
+    # case-insensitive selection of category codes
+    def select(self, categories: [str]) -> np.ndarray:
+        wanted = {str(category).lower() for category in categories}
+        return np.array([folded in wanted for folded in self.folded], dtype=bool)
+
+    # case-folded categories that occur in at least one row
+    def folded_categories(self) -> {str}:
+        return {self.folded[code] for code in np.unique(self.codes)}
+
+    # bool array over num_rows rows that have at least one of the given categories
+    def matches(self, categories: [str], num_rows: int) -> np.ndarray:
+        mask = np.zeros(num_rows, dtype=bool)
+        if len(self.categories) > 0:
+            mask[self.rows[self.select(categories)[self.codes]]] = True
+        return mask
+
+    def take(self, mask: np.ndarray) -> 'Column':
+        keep = mask[self.rows]
+        new_rows = np.cumsum(mask) - 1
+        return Column(self.categories,
+                      new_rows[self.rows[keep]],
+                      self.codes[keep],
+                      None if self.values is None else self.values[mask])
+
+    @staticmethod
+    def concat(columns: ['Column'], row_counts: [int]) -> 'Column':
+        categories = []
+        index = {}
+        rows = []
+        codes = []
+        offset = 0
+        for column, num_rows in zip(columns, row_counts):
+            remap = np.empty(len(column.categories), dtype=np.int64)
+            for code, category in enumerate(column.categories):
+                if category not in index:
+                    index[category] = len(categories)
+                    categories.append(category)
+                remap[code] = index[category]
+            rows.append(column.rows + offset)
+            codes.append(remap[column.codes])
+            offset += num_rows
+        values = None
+        if len(columns) > 0 and all(column.values is not None for column in columns):
+            values = np.concatenate([column.values for column in columns])
+        return Column(categories,
+                      np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64),
+                      np.concatenate(codes) if codes else np.zeros(0, dtype=np.int64),
+                      values)
+
+
+# Maps the case-folded categories of a Column to packed bitsets over the rows
+# of a table, so that selections over categories become bitwise operations.
+class BitmapIndex:
+    def __init__(self, bitsets: {str: np.ndarray}, num_rows: int):
+        self.bitsets = bitsets
+        self.num_rows = num_rows
+
+    @staticmethod
+    def from_column(column: Column, num_rows: int) -> 'BitmapIndex':
+        bitsets = {}
+        order = np.argsort(column.codes, kind="stable")
+        ends = np.cumsum(column.counts())
+        start = 0
+        for code, end in enumerate(ends):
+            if end == start:
+                continue
+            mask = np.zeros(num_rows, dtype=bool)
+            mask[column.rows[order[start:end]]] = True
+            start = end
+            bits = np.packbits(mask)
+            folded = column.folded[code]
+            if folded in bitsets:
+                bitsets[folded] = bitsets[folded] | bits
+            else:
+                bitsets[folded] = bits
+        return BitmapIndex(bitsets, num_rows)
+
+    def none(self) -> np.ndarray:
+        return np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+
+    # OR of the bitsets of the given categories
+    def any_of(self, categories: [str]) -> np.ndarray:
+        bits = self.none()
+        for category in categories:
+            folded = str(category).lower()
+            if folded in self.bitsets:
+                bits |= self.bitsets[folded]
+        return bits
+
+    # case-folded categories that occur in at least one row
+    def categories(self) -> {str}:
+        return set(self.bitsets.keys())
+
+    def mask(self, bits: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bits, count=self.num_rows).astype(bool)
+
+
+# Columnar view of raw data entries with one Column per Field. The raw entries
+# remain available as a list in Table.rows.
+class Table:
+    def __init__(self, rows: [object], columns: {str: Column}):
+        self.rows = rows
+        self.columns = columns
+
+    @staticmethod
+    def from_entries(entries: [object], fields) -> 'Table':
+        entries = list(entries)
+        return Table(entries, {field.name: field.column(entries) for field in fields})
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, item):
+        return self.rows[item]
+
+    def column(self, name: str) -> Column:
+        return self.columns[name]
+
+    # new table with the rows selected by the bool array mask
+    def take(self, mask: np.ndarray) -> 'Table':
+        rows = [row for row, keep in zip(self.rows, mask) if keep]
+        return Table(rows, {name: column.take(mask) for name, column in self.columns.items()})
+
+    @staticmethod
+    def concat(tables: ['Table'], fields) -> 'Table':
+        if len(tables) == 0:
+            return Table.from_entries([], fields)
+        if len(tables) == 1:
+            return tables[0]
+        rows = [row for table in tables for row in table.rows]
+        row_counts = [len(table) for table in tables]
+        columns = {}
+        for field in fields:
+            columns[field.name] = Column.concat([table.columns[field.name] for table in tables], row_counts)
+        return Table(rows, columns)
@@ -1,12 +1,31 @@
-import sys, json, numbers, os
+import sys, ast, json, numbers, os, heapq, threading
+from collections import namedtuple, OrderedDict
 from difflib import SequenceMatcher
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
 from colorama import Fore
 
+from nlu.airport_registry import airports
+from qpx.lru import LRUCache
+
 FUZZ_RATIO = 1.
 
+# characters are counted in this many buckets for the similarity ratio bounds
+CHARACTER_BUCKETS = 40
+# batches with fewer distinct queries are resolved in the calling process
+MIN_PARALLEL_BATCH = 8
+# relative tolerance of score bounds against rounding of the summed scores
+BOUND_TOLERANCE = 1e-9
+# memory budget of the ranked matches cached per query
+MATCHES_CACHE_BYTES = 64 * 1024 * 1024
+# statement keys with location mentions that are resolved to airports
+LOCATION_KEYS = ["o_location", "o_entity", "d_location", "d_entity", "u_location", "u_entity"]
+
 resolved = False
 
-available_options = json.load(open(os.path.dirname(__file__) + "/airports2.json", "r", encoding="utf8"))
+available_options = airports.airports
 
 column_scores = {
     "Name": 1.0,
@@ -24,51 +43,317 @@ def score(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
 
+# letters, digits and space have a bucket of their own, other characters share a few
+def character_bucket(character: str) -> int:
+    if "a" <= character <= "z":
+        return ord(character) - ord("a")
+    if "0" <= character <= "9":
+        return 26 + ord(character) - ord("0")
+    if character == " ":
+        return 36
+    return 37 + ord(character) % (CHARACTER_BUCKETS - 37)
+
+
+def character_counts(text: str) -> np.ndarray:
+    counts = np.zeros(CHARACTER_BUCKETS, dtype=np.int32)
+    for character in text:
+        counts[character_bucket(character)] += 1
+    return counts
+
+
+# airport row prepared for scoring: the (key, lowercase value, column weight) of
+# each scored column, the multiplier of the row and the number of scored columns
+ScoringRow = namedtuple("ScoringRow", ["row", "values", "multiplier", "applicable"])
+
+# lowercase query with the (word or pair of words, partial match bonus) it is matched with,
+# a SequenceMatcher that keeps the analysis of the query between rows and the similarity
+# ratios computed so far, as values such as countries and regions repeat across rows
+ScoringQuery = namedtuple("ScoringQuery", ["text", "partials", "matcher", "ratios"])
+
+
+# Applies the rules of the original scoring loop once per row: columns are
+# visited in row order, values that are None or numbers are skipped, and a
+# missing code lowers the multiplier and ends the row, so later columns are ignored.
+def normalize_row(row: {str: object}) -> ScoringRow:
+    values = []
+    multiplier = 1.  # higher weights for airports with IATA_FAA or ICAO number
+    multiplier *= row["Size"]
+    for key, value in row.items():
+        if key == "Code" and (value is None or value == ""):
+            multiplier *= 0.05
+            break
+        if key not in ["Name", "Region", "Country", "City", "Code"]:
+            continue
+        if value is None or isinstance(value, numbers.Number):
+            continue
+        values.append((key, value.lower(), column_scores[key]))
+    return ScoringRow(row, values, multiplier, float(len(values)))
+
+
+def normalize_query(query: str) -> ScoringQuery:
+    query = query.lower()
+    words = query.split()
+    phrases = words + ["%s %s" % (w1, w2) for w1, w2 in zip(words, words[1:])]
+    return ScoringQuery(query,
+                        [(phrase, len(phrase) / len(words)) for phrase in phrases],
+                        SequenceMatcher(None, "", query),
+                        {})
+
+
+# Upper bounds of score_row for all rows at once. The distinct column values
+# are kept with the counts of their characters: the similarity ratio of a value
+# is at most 2 * (characters it shares with the query) / (total length), like
+# SequenceMatcher.quick_ratio, and the partial and exact matches are checked
+# once per distinct value rather than once per row.
+class ScoreBounds:
+    def __init__(self, rows: [ScoringRow]):
+        value_ids = {}  # {str: int}
+        width = max([len(row.values) for row in rows] + [1])
+        self.value_ids = np.zeros((len(rows), width), dtype=np.int64)
+        self.weights = np.zeros((len(rows), width))  # 0 for columns a row does not have
+        self.exact_bonuses = np.zeros((len(rows), width))
+        for i, row in enumerate(rows):
+            for j, (key, value, weight) in enumerate(row.values):
+                self.value_ids[i, j] = value_ids.setdefault(value, len(value_ids))
+                self.weights[i, j] = weight
+                self.exact_bonuses[i, j] = 50 if key == "Code" else 20
+        self.value_index = value_ids
+        self.values = list(value_ids)
+        self.counts = np.array([character_counts(value) for value in self.values],
+                               dtype=np.int32).reshape(len(self.values), CHARACTER_BUCKETS)
+        self.lengths = np.array([len(value) for value in self.values], dtype=np.int64)
+        self.scales = np.array([row.multiplier / row.applicable if row.applicable > 0 else 0. for row in rows])
+
+    def bounds(self, query: ScoringQuery) -> np.ndarray:
+        shared = np.minimum(self.counts, character_counts(query.text)).sum(axis=1)
+        lengths = self.lengths + len(query.text)
+        value_bounds = np.where(lengths > 0, 2. * shared / np.maximum(lengths, 1), 1.)
+        for phrase, bonus in query.partials:
+            value_bounds += bonus * np.fromiter((phrase in value for value in self.values),
+                                                dtype=bool, count=len(self.values))
+        row_bounds = self.weights * value_bounds[self.value_ids]
+        exact = self.value_index.get(query.text)
+        if exact is not None:
+            row_bounds += self.exact_bonuses * (self.value_ids == exact) * (self.weights > 0)
+        return self.scales * row_bounds.sum(axis=1)
+
+
+# scoring rows of the airports with the bounds of their scores
+def build_scoring_table() -> ([ScoringRow], ScoreBounds):
+    rows = [normalize_row(row) for row in available_options]
+    return rows, ScoreBounds(rows)
+
+
+scoring_rows, score_bounds = build_scoring_table()
+
+
+# weighted similarity of the query to the row's columns, None if no column applies
+def score_row(row: ScoringRow, query: ScoringQuery) -> float:
+    if row.applicable == 0:
+        return None
+    row_score = 0
+    for key, value, column_score in row.values:
+        ratio = query.ratios.get(value)
+        if ratio is None:
+            query.matcher.set_seq1(value)
+            ratio = query.ratios[value] = query.matcher.ratio()
+        row_score += ratio * column_score
+        # equivalent partial matches:
+        for phrase, bonus in query.partials:
+            if phrase in value:
+                row_score += bonus * column_score
+        if query.text == value:
+            print(Fore.LIGHTBLACK_EX + "Exact match for airport %s %s of %s." % (key, row.row[key], row.row["Name"]) + Fore.BLACK)
+            row_score += 50 if key == "Code" else 20
+    row_score *= row.multiplier / row.applicable
+    return row_score
+
+
+# Scores the rows with the given ids and returns the codes of rows scoring above
+# FUZZ_RATIO, best first and in row order among equal scores. With a limit only
+# the best rows are kept in a heap. With prune, rows are visited by descending
+# score bound and the scan ends once no bound reaches the lowest score that
+# still counts, so no row that could rank is skipped.
+def rank(query: str, row_ids, limit: int = None, prune: bool = True) -> [(str, float)]:
+    query = normalize_query(query)
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    if prune:
+        bounds = score_bounds.bounds(query)[row_ids] * (1. + BOUND_TOLERANCE)
+        order = np.argsort(-bounds, kind="stable")
+        row_ids, bounds = row_ids[order], bounds[order]
+    else:
+        bounds = np.full(len(row_ids), np.inf)
+    matches = []  # heap of (score, -row id, code)
+    threshold = FUZZ_RATIO
+    for i, bound in zip(row_ids, bounds):
+        if bound < threshold:
+            break
+        row = scoring_rows[i]
+        row_score = score_row(row, query)
+        if row_score is None or row_score <= FUZZ_RATIO:
+            continue
+        entry = (row_score, -int(i), row.row["Code"])
+        if limit is None:
+            matches.append(entry)
+        elif len(matches) < limit:
+            heapq.heappush(matches, entry)
+        else:
+            heapq.heappushpop(matches, entry)
+        if limit is not None and len(matches) == limit:
+            threshold = max(FUZZ_RATIO, matches[0][0])
+    return [(code, row_score) for row_score, _, code in sorted(matches, key=lambda entry: (-entry[0], -entry[1]))]
+
+
+# lowercase query with collapsed whitespace, queries that only differ in case
+# or spacing share their matches
+def query_key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
 # resolves airport codes from eny string and returns list of matching
-# airport codes with confidence scores
-def find_matches(query: str) -> [(str, float)]:
+# airport codes with confidence scores. Results are cached per query_key,
+# cached results of the full ranking also serve queries with a limit.
+def find_matches(query: str, limit: int = None) -> [(str, float)]:
+    check_airports_file()
+    query = query_key(query)
+    key = (query, None) if (query, None) in matches_cache else (query, limit)
+    matches = matches_cache.get(key)
+    if matches is None:
+        matches = resolve(query, limit)
+        matches_cache.put((query, limit), matches)
+    return list(matches[:limit])
+
+
+# find_matches without the cache
+def resolve(query: str, limit: int = None) -> [(str, float)]:
     query = query.lower()
     if len(query) == 3:
-        for row in available_options:
-            if row["Code"].lower() == query:
-                print("Airport could be directly resolved from code %s." % row["Code"])
-                return [(row["Code"], 1)]
-    matches = []
-    for row in available_options:
-        row_score = 0
-        row_multiplier = 1.  # higher weights for airports with IATA_FAA or ICAO number
-        row_multiplier *= row["Size"]
-        applicable_values = 0
-        for key, value in row.items():
-            if key == "Code" and (value is None or value == ""):
-                row_multiplier *= 0.05
-                break
-            if key not in ["Name", "Region", "Country", "City", "Code"]:
-                continue
-            if value is None or isinstance(value, numbers.Number):
-                continue
-            value = value.lower()
-            column_score = column_scores[key]
-            row_score += score(value, query) * column_score
-            # equivalent partial matches:
-            for word in query.split():
-                if word in value:
-                    # print("Partial match between %s and %s" % (value, query))
-                    row_score += len(word) / len(query.split()) * column_score
-
-            for w1,w2 in zip(query.split(), query.split()[1:]):
-                word = "%s %s" % (w1, w2)
-                if word in value:
-                    row_score += len(word) / len(query.split()) * column_score
-            if query == value:
-                print(Fore.LIGHTBLACK_EX + "Exact match for airport %s %s of %s." % (key, row[key], row["Name"]) + Fore.BLACK)
-                row_score += 50 if key == "Code" else 20
-            applicable_values += 1.
-        if applicable_values > 0:
-            row_score *= row_multiplier / applicable_values
-            if row_score > FUZZ_RATIO:
-                matches.append((row["Code"], row_score))
-    return sorted(matches, key=lambda entry: entry[1], reverse=True)
+        row = airports.find_by_code(query)
+        if row is not None:
+            print("Airport could be directly resolved from code %s." % row["Code"])
+            return [(row["Code"], 1)]
+    return rank(query, np.arange(len(scoring_rows)), limit)
+
+
+# find_matches without score bounds, scores every row
+def find_matches_exhaustive(query: str, limit: int = None) -> [(str, float)]:
+    return rank(query, np.arange(len(scoring_rows)), limit, prune=False)
+
+
+# pool of worker processes shared by all batches, started on first use. The
+# workers hold a copy of the scoring table, so reload() closes the pool.
+_pool = None
+_pool_processes = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(processes: int) -> Pool:
+    global _pool, _pool_processes
+    with _pool_lock:
+        if _pool is not None and _pool_processes != processes:
+            _pool.terminate()
+            _pool = None
+        if _pool is None:
+            _pool = Pool(processes)
+            _pool_processes = processes
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool = None
+
+
+# find_matches for many queries, returns the ranked matches in the order of the
+# queries. Every distinct query is resolved once; large batches are spread over
+# a pool of worker processes, one per CPU by default.
+def find_matches_batch(queries: [str], processes: int = None, limit: int = None) -> [[(str, float)]]:
+    distinct = list(OrderedDict.fromkeys(query_key(query) for query in queries))
+    processes = processes or os.cpu_count() or 1
+    missing = [query for query in distinct
+               if (query, None) not in matches_cache and (query, limit) not in matches_cache]
+    matches = {}
+    if len(missing) >= MIN_PARALLEL_BATCH and processes > 1:
+        check_airports_file()
+        results = get_pool(processes).map(partial(resolve, limit=limit), missing, chunksize=1)
+        for query, result in zip(missing, results):
+            matches_cache.put((query, limit), result)
+            matches[query] = result
+    for query in distinct:
+        if query not in matches:
+            matches[query] = find_matches(query, limit)
+    return [list(matches[query_key(query)]) for query in queries]
+
+
+matches_cache = LRUCache(MATCHES_CACHE_BYTES)
+_reload_lock = threading.Lock()
+
+
+# rebuilds the scoring table and drops all cached matches once airports2.json changed
+def check_airports_file():
+    if airports.changed():
+        with _reload_lock:
+            if airports.changed():
+                reload()
+
+
+def reload():
+    global scoring_rows, score_bounds
+    airports.reload()
+    scoring_rows, score_bounds = build_scoring_table()
+    matches_cache.clear()
+    close_pool()
+
+
+# statistics of the matches cache including its hit rate
+def cache_stats() -> {str: object}:
+    stats = matches_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups > 0 else 0.
+    return stats
+
+
+# resolves the queries into the matches cache, returns the number of distinct queries
+def warm_up(queries: [str], processes: int = None) -> int:
+    find_matches_batch(queries, processes)
+    return len({query_key(query) for query in queries})
+
+
+# strings of the list assigned to name in a Python file, such as the CITIES of
+# test/test_dialog_questions.py, read without importing the file
+def queries_from_python_list(path: str, name: str = "CITIES") -> [str]:
+    for node in ast.parse(open(path, "r", encoding="utf8").read()).body:
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == name
+                                                for target in node.targets):
+            return [value for value in ast.literal_eval(node.value) if isinstance(value, str)]
+    return []
+
+
+# location mentions of the users in a session log written by server.py: the
+# locations extracted from their inputs and their answers to origin and
+# destination questions
+def queries_from_session_log(path: str) -> [str]:
+    queries = []
+    for session in json.load(open(path, "r", encoding="utf8")).get("sessions", []):
+        last_question = None
+        for turn in session.get("turns", []):
+            if turn["type"] == "question":
+                last_question = turn["data"]
+            elif turn["type"] == "input":
+                try:
+                    data = ast.literal_eval(turn["data"])
+                except (ValueError, SyntaxError):
+                    data = turn["data"]
+                if isinstance(data, dict):
+                    for key, value in data.get("extracted", {}).items():
+                        if key in LOCATION_KEYS:
+                            queries.extend([value] if isinstance(value, str) else value)
+                elif last_question in ["Origin", "Destination"]:
+                    queries.append(turn["data"])
+    return queries
 
 
 def main(argv):
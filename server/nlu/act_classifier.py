@@ -1,21 +1,33 @@
 # act_classifier.py
 
-import glob
+import os
 import re
 import subprocess
-from sys import platform
+import tempfile
+import threading
+import time
+from collections import namedtuple
 
-weka_jar_path = glob.glob('**/weka.jar', recursive=True)[0]
-utterance_path = glob.glob('**/utterance.arff', recursive=True)[0]
-model_path = glob.glob('**/j48.model', recursive=True)[0]
-java_classifier_path = re.sub('\/DialogActClassifier\..+$', '',
-	glob.glob('**/DialogActClassifier*', recursive=True)[0])
-class_path_separator = ';' if (platform == 'win32' or platform == 'cygwin') else ':'
+from nlu import config
 
-cmd = ''.join([
-	'java ', '-cp ', java_classifier_path, class_path_separator, weka_jar_path, ' ',
-	'DialogActClassifier', ' ', model_path, ' ', utterance_path
-])
+# keeps the model loaded in one JVM and classifies utterances sent over stdin,
+# followed by the path of an ARFF file it classifies the first utterance of that file
+def classifier_command():
+	return ['java', '-cp', os.pathsep.join([config.DIALOG_ACT_CLASSIFIER_DIRECTORY, config.WEKA_JAR]),
+		'DialogActClassifier', config.J48_MODEL]
+
+# number of utterances written to the classifier process before reading their tags,
+# keeps both pipes from filling up on large batches
+BATCH_CHUNK = 256
+
+ARFF_HEADER = ['@relation DIALOG_UTTERANCES',
+	'@attribute DOC_TEXT string',
+	'@attribute HAS_QUESTION_MARK {true, false}',
+	'@attribute HAS_AFFIRMATIVE {true, false}',
+	'@attribute HAS_NEGATIVE {true, false}',
+	'@attribute STARTING_POS {CC, CD, DT, EX, FW, IN, JJ, JJR, JJS, LS, MD, NN, NNS, NNP, NNPS, PDT, POS, PRP, PRP$, RB, RBR, RBS, RP, SYM, TO, UH, VB, VBD, VBG, VBN, VBP, VBZ, WDT, WP, WP$, WRB, X}',
+	'@attribute ACT_TAG {statement, question, yes, no, other}',
+	'@data']
 
 pos_tags = {'CC', 'CD', 'DT', 'EX', 'FW', 'IN', 'JJ', 'JJR', 'JJS', 'LS', 'MD', 'NN',
 	'NNS', 'NNP', 'NNPS', 'PDT', 'POS', 'PRP', 'PRP$', 'RB', 'RBR', 'RBS', 'RP', 'SYM',
@@ -43,30 +55,122 @@ def check_if_has_negative(text):
 			return 'true'
 	return 'false'
 
-def prepare_arff(doc):
-	output = ['@relation DIALOG_UTTERANCES',
-			  '@attribute DOC_TEXT string',
-			  '@attribute HAS_QUESTION_MARK {true, false}',
-			  '@attribute HAS_AFFIRMATIVE {true, false}',
-			  '@attribute HAS_NEGATIVE {true, false}',
-			  '@attribute STARTING_POS {CC, CD, DT, EX, FW, IN, JJ, JJR, JJS, LS, MD, NN, NNS, NNP, NNPS, PDT, POS, PRP, PRP$, RB, RBR, RBS, RP, SYM, TO, UH, VB, VBD, VBG, VBN, VBP, VBZ, WDT, WP, WP$, WRB, X}',
-			  '@attribute ACT_TAG {statement, question, yes, no, other}',
-			  '@data']
+# features of an utterance as given to the J48 model
+Features = namedtuple('Features', ['doc_text', 'has_question_mark', 'has_affirmative',
+	'has_negative', 'starting_pos'])
+
+def extract_features(doc):
 	doc_text = re.sub('[^\w \.,\'\?!]', '', doc.text)
-	has_question_mark = 'true' if '?' in doc_text else 'false'
-	has_affirmative = check_if_has_affirmative(doc_text)
-	has_negative = check_if_has_negative(doc_text)
-	starting_pos = get_starting_pos(doc)
-	output.append('"{}",{},{},{},{},{}'.format(doc_text, has_question_mark,
-		has_affirmative, has_negative, starting_pos, '?'))
-	with open(utterance_path, 'w') as f:
-		f.write('\n'.join(output))
+	return Features(doc_text,
+		'true' if '?' in doc_text else 'false',
+		check_if_has_affirmative(doc_text),
+		check_if_has_negative(doc_text),
+		get_starting_pos(doc))
+
+# ARFF data line with the features of an utterance and an unknown act tag
+def format_instance(features):
+	return '"{}",{},{},{},{},{}'.format(features.doc_text, features.has_question_mark,
+		features.has_affirmative, features.has_negative, features.starting_pos, '?')
+
+# classifies one utterance with a new JVM through an ARFF file private to this call
+def classify_with_new_jvm(features):
+	fd, path = tempfile.mkstemp(suffix='.arff')
+	try:
+		with os.fdopen(fd, 'w') as f:
+			f.write('\n'.join(ARFF_HEADER + [format_instance(features)]))
+		result = subprocess.run(classifier_command() + [path], stdout=subprocess.PIPE, universal_newlines=True)
+		return result.stdout.strip()
+	finally:
+		os.remove(path)
+
+
+# Long-lived classifier process that loads the J48 model once. It receives the
+# ARFF header on start and then one data line per utterance, answering each
+# with the act tag on its own line.
+class ClassifierProcess:
+	def __init__(self, command):
+		self.lock = threading.Lock()
+		self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+			universal_newlines=True, bufsize=1)
+		self.process.stdin.write('\n'.join(ARFF_HEADER) + '\n')
+		self.process.stdin.flush()
+		if self.process.stdout.readline().strip() != 'ready':
+			self.close()
+			raise RuntimeError('Dialog act classifier process did not start.')
+
+	def alive(self):
+		return self.process.poll() is None
+
+	# act tags of the ARFF data lines in the same order, the lock keeps the
+	# answers of concurrent callers apart
+	def classify(self, instances):
+		results = []
+		with self.lock:
+			for start in range(0, len(instances), BATCH_CHUNK):
+				chunk = instances[start:start + BATCH_CHUNK]
+				self.process.stdin.write(''.join(instance + '\n' for instance in chunk))
+				self.process.stdin.flush()
+				for instance in chunk:
+					result = self.process.stdout.readline().strip()
+					if result == '' or result == 'error':
+						# later answers would no longer line up with their utterances
+						self.process.kill()
+						raise RuntimeError('Dialog act classifier process failed on ' + instance)
+					results.append(result)
+		return results
+
+	def close(self):
+		if self.alive():
+			self.process.stdin.close()
+			self.process.wait()
+
+
+# seconds before the classifier process is started again after a failed start,
+# doubled after every further failure up to MAX_RETRY_BACKOFF
+RETRY_BACKOFF = 5.
+MAX_RETRY_BACKOFF = 300.
+
+worker = None
+worker_lock = threading.Lock()
+worker_retry_at = 0.  # time.monotonic() before which no process is started
+worker_backoff = RETRY_BACKOFF
+
+# the running classifier process, started on first use and restarted if it
+# exited, None while it cannot be started, in which case every utterance
+# starts its own JVM until the next attempt
+def get_worker():
+	global worker, worker_retry_at, worker_backoff
+	with worker_lock:
+		if worker is not None and worker.alive():
+			return worker
+		worker = None
+		if time.monotonic() < worker_retry_at:
+			return None
+		try:
+			worker = ClassifierProcess(classifier_command())
+			worker_backoff = RETRY_BACKOFF
+		except (OSError, RuntimeError) as e:
+			print('Could not start dialog act classifier process, retrying in %.0f s.' % worker_backoff, e)
+			worker_retry_at = time.monotonic() + worker_backoff
+			worker_backoff = min(2 * worker_backoff, MAX_RETRY_BACKOFF)
+		return worker
+
+# act tags of many utterances given by their features, in the same order
+def classify_features(features):
+	features = list(features)
+	process = get_worker()
+	if process is not None:
+		try:
+			return process.classify([format_instance(f) for f in features])
+		except (OSError, RuntimeError) as e:
+			print('Dialog act classifier process failed, starting a new JVM instead.', e)
+	return [classify_with_new_jvm(f) for f in features]
 
+def classify_batch(docs):
+	return classify_features([extract_features(doc) for doc in docs])
 
 def classify(doc):
-	prepare_arff(doc)
-	result = subprocess.getoutput(cmd)
-	return result.strip()
+	return classify_batch([doc])[0]
 
 
 def simple_classify(utterance):
@@ -1,26 +1,22 @@
-import glob, json, os
+import glob, os
 from typing import Union
 
-import sys
+from nlu.airport_registry import airports
 
-available_airports = json.load(open(os.path.dirname(__file__) + "/airports2.json", "r", encoding="utf8"))
+available_airports = airports.airports
 
 
 def find_airport_by_code(code: str) -> Union[None, object]:
-    code = code.upper()
-    for airport in available_airports:
-        if airport["Code"] == code:
-            return airport
-            # {
-            #     "Country": "United States",
-            #     "Code": "00AK",
-            #     "Region": "Alaska",
-            #     "GPS_Code": "00AK",
-            #     "Name": "Lowell Field",
-            #     "City": "Anchor Point",
-            #     "Size": 1
-            # }
-    return None
+    return airports.find_by_code(code)
+    # {
+    #     "Country": "United States",
+    #     "Code": "00AK",
+    #     "Region": "Alaska",
+    #     "GPS_Code": "00AK",
+    #     "Name": "Lowell Field",
+    #     "City": "Anchor Point",
+    #     "Size": 1
+    # }
 
 
 def find_airport_wordcloud(airport: {str: str}) -> Union[None, str]:
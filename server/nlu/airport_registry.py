@@ -0,0 +1,73 @@
+import json, os
+from typing import Union
+
+AIRPORTS_FILE = os.path.join(os.path.dirname(__file__), "airports2.json")
+
+
+# modification time and size of a file, None if it does not exist
+def file_signature(path: str) -> (int, int):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# All airports of airports2.json with hash indexes by IATA/FAA code, GPS code
+# and case-folded name. Like the linear scans they replace, lookups return the
+# first airport in file order. The order of the airports list is relied upon by
+# indexes built over it and must not be changed.
+class AirportRegistry:
+    def __init__(self, airports: [{str: object}], path: str = None):
+        self.path = path
+        self.signature = None if path is None else file_signature(path)
+        self.airports = airports
+        self.index()
+
+    # builds the lookup dictionaries over the airports
+    def index(self):
+        self.by_code = {}  # {str: object}
+        self.by_gps_code = {}  # {str: object}
+        self.by_name = {}  # {str: object}
+        for airport in self.airports:
+            if airport["Code"]:
+                self.by_code.setdefault(airport["Code"].upper(), airport)
+            if airport["GPS_Code"]:
+                self.by_gps_code.setdefault(airport["GPS_Code"].upper(), airport)
+            if airport["Name"]:
+                self.by_name.setdefault(airport["Name"].casefold(), airport)
+
+    @staticmethod
+    def load(path: str = AIRPORTS_FILE) -> 'AirportRegistry':
+        return AirportRegistry(json.load(open(path, "r", encoding="utf8")), path)
+
+    # whether the airport file was modified since it was loaded
+    def changed(self) -> bool:
+        return self.path is not None and file_signature(self.path) != self.signature
+
+    # reads the airport file again, the airports list is updated in place so
+    # that modules holding on to it see the new airports
+    def reload(self):
+        signature = file_signature(self.path)
+        self.airports[:] = json.load(open(self.path, "r", encoding="utf8"))
+        self.signature = signature
+        self.index()
+
+    def __len__(self):
+        return len(self.airports)
+
+    def __iter__(self):
+        return iter(self.airports)
+
+    def find_by_code(self, code: str) -> Union[None, object]:
+        return self.by_code.get(code.upper())
+
+    def find_by_gps_code(self, gps_code: str) -> Union[None, object]:
+        return self.by_gps_code.get(gps_code.upper())
+
+    def find_by_name(self, name: str) -> Union[None, object]:
+        return self.by_name.get(name.casefold())
+
+
+# loaded once per process and shared by nlu.airport and nlu.ResolveAirport
+airports = AirportRegistry.load()
@@ -0,0 +1,25 @@
+# config.py
+# Locations of the NLU models and resources. Paths are absolute, so they do not
+# depend on the working directory of the server; deployments that keep the
+# resources elsewhere assign these before the NLU service loads.
+
+import os
+
+NLU_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# spaCy model name or path
+SPACY_MODEL = 'en'
+# spaCy components to load: extract_info needs the tagger (tags and lemmas), the
+# parser (head and ancestors) and the entity recognizer, but not the matcher
+# or the word vectors
+SPACY_COMPONENTS = ('tagger', 'parser', 'entity')
+# directory with the CoreNLP jars of python-sutime
+SUTIME_JARS = os.path.join(NLU_DIRECTORY, 'python_sutime', 'jars')
+# run SUTime in a worker process with its own JVM rather than in the server process
+SUTIME_WORKER_PROCESS = True
+AIRLINES_CSV = os.path.join(NLU_DIRECTORY, 'airline_names.csv')
+
+WEKA_JAR = os.path.join(NLU_DIRECTORY, 'weka', 'weka.jar')
+# directory with DialogActClassifier.class and its serialized J48 model
+DIALOG_ACT_CLASSIFIER_DIRECTORY = os.path.join(NLU_DIRECTORY, 'weka')
+J48_MODEL = os.path.join(DIALOG_ACT_CLASSIFIER_DIRECTORY, 'j48.model')
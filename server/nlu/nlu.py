@@ -1,33 +1,73 @@
 # nlu.py
 
+import copy
 import csv
 import datetime
-import os
-import glob
 import re
-import json
+import threading
+from bisect import bisect_right
 import spacy
-import sutime as sutime
-from nlu import act_classifier
+from nlu import act_classifier, config, time_tagging
+from qpx.lru import LRUCache
 
 
 ##################
 # INITIALIZATION #
 ##################
 
-# spacy parser
+# spacy parser, caching SUTime tagger and airline list, set by load()
+nlp = None
+time_tagger = None
+AIRLINES = {}
 
-nlp = spacy.load('en')
+load_lock = threading.Lock()
 
-# sutime tagger
-jars = os.path.join(os.path.dirname('__file__'), 'nlu/python_sutime/jars')
-time_tagger = sutime.SUTime(jars, mark_time_ranges=True)
+# components spacy.load can leave out and the names of their overrides in spaCy 1.x
+SPACY_OPTIONAL_COMPONENTS = {
+    'tagger': 'tagger',
+    'parser': 'parser',
+    'entity': 'entity',
+    'matcher': 'matcher',
+    'vectors': 'add_vectors',
+}
 
-# airline list
-# airline_names_path = glob.glob('**/airline_names.csv', recursive=True)[0]
-with open('nlu/airline_names.csv', 'r') as csvfile:
-    airline_reader = csv.reader(csvfile, delimiter=',', quotechar='"')
-    AIRLINES = {row[1].upper(): row[3].upper() or row[4].upper() for row in airline_reader}
+# utterances spaCy parses at once and its number of threads in extract_info_batch
+PIPE_BATCH_SIZE = 256
+PIPE_THREADS = 2
+
+
+def load_airlines(path):
+    with open(path, 'r') as csvfile:
+        airline_reader = csv.reader(csvfile, delimiter=',', quotechar='"')
+        return {row[1].upper(): row[3].upper() or row[4].upper() for row in airline_reader}
+
+
+# spaCy model with only the given components, by default those of nlu.config
+def load_spacy(model=None, components=None):
+    components = config.SPACY_COMPONENTS if components is None else components
+    unknown = set(components) - set(SPACY_OPTIONAL_COMPONENTS)
+    if unknown:
+        raise ValueError('Unknown spaCy components: ' + ', '.join(sorted(unknown)))
+    overrides = {override: False for component, override in SPACY_OPTIONAL_COMPONENTS.items()
+                 if component not in components}
+    return spacy.load(model or config.SPACY_MODEL, **overrides)
+
+
+# loads the models from the paths in nlu.config once, later calls return immediately
+def load():
+    global nlp, time_tagger, AIRLINES
+    with load_lock:
+        if nlp is not None:
+            return
+        AIRLINES = load_airlines(config.AIRLINES_CSV)
+        if config.SUTIME_WORKER_PROCESS:
+            worker = time_tagging.TaggerWorker()
+            # start the JVM of the tagger now rather than on the first utterance
+            worker.get_process()
+            time_tagger = time_tagging.TimeTagger(worker.parse)
+        else:
+            time_tagger = time_tagging.TimeTagger(time_tagging.start_sutime().parse)
+        nlp = load_spacy()
 
 ###################
 # IMPORTANT WORDS #
@@ -60,6 +100,35 @@ def indicates(token, topic):
     return True if token.lemma_ in RELATED_WORDS[topic] else False
 
 
+# The parts of a spaCy doc the detectors use, collected in one pass over its
+# tokens so that the detectors neither walk the doc nor lower-case its text again
+class ParsedUtterance:
+    def __init__(self, doc):
+        self.doc = doc
+        self.text = doc.text
+        self.lower_text = doc.text.lower()
+        self.ents = list(doc.ents)
+        self.tokens = []
+        self.starts = []  # character offset of each token
+        self.stripped = []  # orth_ of each token without punctuation
+        self.iata_tokens = []
+        self.comparatives = set()  # lower-cased comparatives and superlatives
+        for token in doc:
+            orth = token.orth_
+            self.tokens.append(token)
+            self.starts.append(token.idx)
+            self.stripped.append(orth.strip(PUNCTUATION))
+            if is_iata(orth):
+                self.iata_tokens.append(token)
+            if token.tag_ in COMPARATIVE_AND_SUPERLATIVE_POS:
+                self.comparatives.add(orth.lower())
+
+    # index of the token the character at offset belongs to, None before the first token
+    def token_index_at(self, offset):
+        i = bisect_right(self.starts, offset) - 1
+        return i if i >= 0 else None
+
+
 ##################
 # NAMED ENTITIES #
 ##################
@@ -100,7 +169,7 @@ def determine_entity_o_d(token):
     return o_d
 
 
-def detect_entities(doc):
+def detect_entities(parsed):
     '''
 	Populates and returns a dict with:
 	'x_location' for named entities tagged as locations or that sound like an airport name
@@ -108,7 +177,7 @@ def detect_entities(doc):
 	'airlines'
 	'''
     keywords = {}
-    for ent in doc.ents:
+    for ent in parsed.ents:
         o_d = determine_entity_o_d(ent.root)
         if ent.label_ == 'GPE' or seems_like_airport(ent.orth_):
             if o_d == 'origin':
@@ -135,22 +204,21 @@ def detect_entities(doc):
     return keywords
 
 
-def detect_iata(doc):
+def detect_iata(parsed):
     '''
 	Populates and returns a dict with:
 	'x_location' for IATA code
 	'''
     keywords = {}
-    for token in doc:
-        if is_iata(token.orth_):
-            if indicates(token.head, 'origin'):
-                keywords.update({'o_location': token.orth_.strip(PUNCTUATION)})
-            elif indicates(token.head, 'destination'):
-                keywords.update({'d_location': token.orth_.strip(PUNCTUATION)})
-            else:
-                if 'u_location' not in keywords:
-                    keywords['u_location'] = []
-                keywords['u_location'].append(token.orth_.strip(PUNCTUATION))
+    for token in parsed.iata_tokens:
+        if indicates(token.head, 'origin'):
+            keywords.update({'o_location': token.orth_.strip(PUNCTUATION)})
+        elif indicates(token.head, 'destination'):
+            keywords.update({'d_location': token.orth_.strip(PUNCTUATION)})
+        else:
+            if 'u_location' not in keywords:
+                keywords['u_location'] = []
+            keywords['u_location'].append(token.orth_.strip(PUNCTUATION))
     return keywords
 
 
@@ -159,29 +227,33 @@ def detect_iata(doc):
 ###################
 
 
-def find_in_doc(doc, word):
-    word = nlp(word)[0].orth_.strip(PUNCTUATION)
-    for token in doc:
-        if word == token.orth_.strip(PUNCTUATION):
+# first token with the same text as the token at the character offset, the
+# token of the utterance stands in for parsing the word of a tag on its own
+def find_in_doc(parsed, offset):
+    i = parsed.token_index_at(offset)
+    if i is None:
+        return None
+    word = parsed.stripped[i]
+    for token, stripped in zip(parsed.tokens, parsed.stripped):
+        if word == stripped:
             return token
     return None
 
 
-def determine_outbound_inbound(doc, text):
-    word = text.split()[0]
-    token = find_in_doc(doc, word)
+def determine_outbound_inbound(parsed, tag):
+    token = find_in_doc(parsed, time_tagging.python_offset(parsed.text, tag['start']))
     for ancestor in token.ancestors:  # search for ancestor verbs
         if indicates(ancestor, 'inbound'):
             return 'inbound'
         elif indicates(ancestor, 'outbound'):
             return 'outbound'
     found_word = False
-    for i in range(1, len(doc)):  # search for nearby prepositions
-        if token == doc[-i]:
+    for i in range(1, len(parsed.tokens)):  # search for nearby prepositions
+        if token == parsed.tokens[-i]:
             found_word = True
-        if found_word and indicates(doc[-i], 'inbound'):
+        if found_word and indicates(parsed.tokens[-i], 'inbound'):
             return 'inbound'
-        elif found_word and indicates(doc[-i], 'outbound'):
+        elif found_word and indicates(parsed.tokens[-i], 'outbound'):
             return 'outbound'
     else:
         return None
@@ -227,11 +299,11 @@ def parse_time(time):
     return (earliest, latest)
 
 
-def parse_datetime_tag(tag, doc):
+def parse_datetime_tag(tag, parsed):
     # automatically assigns a date if time is also provided, so the date should be
     # ignored if only a time was expected
     keywords = {}
-    outbound_inbound = determine_outbound_inbound(doc, tag['text'])
+    outbound_inbound = determine_outbound_inbound(parsed, tag)
     date_time = tag['value'].split('T')
     date = parse_date(date_time[0])
     earliest, latest = None, None
@@ -257,16 +329,91 @@ def parse_datetime_tag(tag, doc):
             return {'u_date': date}
 
 
-def detect_datetimes(doc):
+# tags is the SUTime output for the text if it was already tagged
+def detect_datetimes(parsed, tags=None):
     keywords = {}
     indices = []
-    tags = time_tagger.parse(doc.text)
+    if tags is None:
+        tags = tag_times([parsed.text])[0]
     for tag in tags:
         indices.append((tag['start'], tag['end']))
-        keywords.update(parse_datetime_tag(tag, doc))
+        keywords.update(parse_datetime_tag(tag, parsed))
     return indices, keywords
 
 
+##################
+# DATE FAST PATH #
+##################
+
+
+# answers date-only utterances without SUTime, see fast_date_tags
+DATE_FAST_PATH = True
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+NUMBER_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+                'eight': 8, 'nine': 9, 'ten': 10, 'a': 1}
+
+DATE_EXPRESSION = re.compile(
+    r'\b(?:(?P<iso>\d{4}-\d{2}-\d{2})'
+    r'|(?P<relative>today|tomorrow)'
+    r'|(?:(?P<modifier>this|next)\s+)?(?P<weekday>' + '|'.join(WEEKDAYS) + r')'
+    r'|in\s+(?P<days>\d{1,3}|' + '|'.join(NUMBER_WORDS) + r')\s+days?)\b',
+    re.IGNORECASE)
+
+# words that may surround a date in an utterance the fast path answers. Anything
+# else (places, times of day, months, other numbers) goes to SUTime.
+DATE_FILLER_WORDS = {'i', "i'd", 'id', "i'm", 'im', 'want', 'would', 'like', 'to', 'leave', 'leaving',
+                     'depart', 'departing', 'fly', 'flying', 'go', 'going', 'travel', 'traveling',
+                     'return', 'returning', 'come', 'coming', 'back', 'on', 'the', 'please', 'and',
+                     'it', 'will', 'be', 'should', 'me', 'my', 'flight', 'date', 'is', 'how', 'about'}
+
+
+# ISO date SUTime assigns to a date expression matched by DATE_EXPRESSION. Like
+# SUTime, weekdays are resolved within the week of today, which parse_date
+# corrects for, and "next" refers to the week after.
+def resolve_date_expression(match, today):
+    if match.group('iso'):
+        return match.group('iso')
+    if match.group('relative'):
+        offset = 0 if match.group('relative').lower() == 'today' else 1
+    elif match.group('weekday'):
+        offset = WEEKDAYS.index(match.group('weekday').lower()) - today.weekday()
+        if match.group('modifier') and match.group('modifier').lower() == 'next':
+            offset += 7
+    else:
+        days = match.group('days').lower()
+        offset = int(days) if days.isdigit() else NUMBER_WORDS[days]
+    return str(today + datetime.timedelta(days=offset))
+
+
+# SUTime tags of an utterance made of one simple date expression (ISO date,
+# weekday, today, tomorrow, in N days) and filler words, None if the fast path
+# cannot decide and SUTime has to tag the utterance
+def fast_date_tags(text, today=None):
+    matches = list(DATE_EXPRESSION.finditer(text))
+    if len(matches) != 1:
+        return None
+    match = matches[0]
+    rest = text[:match.start()] + ' ' + text[match.end():]
+    for word in rest.lower().split():
+        if word.strip(PUNCTUATION) not in DATE_FILLER_WORDS and word.strip(PUNCTUATION) != '':
+            return None
+    today = today or datetime.date.today()
+    return [{'text': match.group(), 'type': 'DATE', 'value': resolve_date_expression(match, today),
+             'start': time_tagging.java_length(text[:match.start()]),
+             'end': time_tagging.java_length(text[:match.end()])}]
+
+
+# SUTime tags of the texts, texts the fast path decides never reach SUTime
+def tag_times(texts):
+    tags = [fast_date_tags(text) if DATE_FAST_PATH else None for text in texts]
+    undecided = [i for i, text_tags in enumerate(tags) if text_tags is None]
+    for i, text_tags in zip(undecided, time_tagger.parse_batch([texts[i] for i in undecided])):
+        tags[i] = text_tags
+    return tags
+
+
 ###########
 # NUMBERS #
 ###########
@@ -290,21 +437,21 @@ def detect_numbers(utterance, exclude):
 #########
 
 
-def detect_cabin_class(doc):
+def detect_cabin_class(parsed):
     '''Populates and returns a dict with:
 	'cabin_class'
 	'''
     keywords = {}
-    text = doc.text.lower()
+    text = parsed.lower_text
     if 'premium' in text or 'deluxe' in text:
         keywords.update({'cabin_class': 'PREMIUM_COACH'})
         return keywords
     for cabin_class in CABIN_CLASS_WORDS:
-        if cabin_class in doc.text.lower():
+        if cabin_class in text:
             keywords.update({'cabin_class': CABIN_CLASS_WORDS[cabin_class]})
         if 'cabin_class' in keywords and \
                         keywords['cabin_class'] == 'FIRST' and \
-                        'the first' in doc.text.lower():
+                        'the first' in text:
             del keywords['cabin_class']
     return keywords
 
@@ -329,15 +476,14 @@ STANDARDIZED_FEATURES = {
 }
 
 
-def detect_comparatives_and_superlatives(doc):
-    return {token.orth_.lower() for token in doc
-            if token.tag_ in COMPARATIVE_AND_SUPERLATIVE_POS}
+def detect_comparatives_and_superlatives(parsed):
+    return set(parsed.comparatives)
 
 
-def detect_flight_features(doc):
+def detect_flight_features(parsed):
     features = set()
     for feature in OTHER_FEATURES:
-        if feature in doc.text:
+        if feature in parsed.text:
             features.add(feature)
     return features
 
@@ -351,9 +497,9 @@ def standardize_qualifiers(qualifiers):
     return standardized_qualifiers
 
 
-def detect_qualifiers(doc):
-    qualifiers = detect_comparatives_and_superlatives(doc)
-    qualifiers |= detect_flight_features(doc)
+def detect_qualifiers(parsed):
+    qualifiers = detect_comparatives_and_superlatives(parsed)
+    qualifiers |= detect_flight_features(parsed)
     qualifiers = standardize_qualifiers(qualifiers)
     if qualifiers:
         return {'qualifiers': list(qualifiers)}
@@ -400,14 +546,15 @@ def assume_inbound_outbound(data):
 # TODO: make origin vs. destination distinguisher more robust? (e.g. "returning to X" assumes X is destination)
 
 
-def extract_info(utterance):
-    doc = nlp(utterance)
-    data = {'dialog_act': act_classifier.classify(doc)}
-    data.update(detect_entities(doc))
-    data.update(detect_iata(doc))
-    data.update(detect_cabin_class(doc))
-    data.update(detect_qualifiers(doc))
-    indices, datetimes = detect_datetimes(doc)
+# keywords of a parsed utterance given its dialog act and SUTime tags
+def analyze(utterance, doc, dialog_act, time_tags):
+    parsed = ParsedUtterance(doc)
+    data = {'dialog_act': dialog_act}
+    data.update(detect_entities(parsed))
+    data.update(detect_iata(parsed))
+    data.update(detect_cabin_class(parsed))
+    data.update(detect_qualifiers(parsed))
+    indices, datetimes = detect_datetimes(parsed, time_tags)
     data.update(datetimes)
     assume_origin_destination(data)
     assume_inbound_outbound(data)
@@ -415,6 +562,114 @@ def extract_info(utterance):
     return data
 
 
+def extract_info(utterance):
+    load()
+    doc = nlp(utterance)
+    return analyze(utterance, doc, act_classifier.classify(doc), tag_times([doc.text])[0])
+
+
+# extract_info of many utterances, in the same order. spaCy parses them in
+# batches, the dialog act classifier and SUTime get few large requests.
+def extract_info_batch(utterances, batch_size=PIPE_BATCH_SIZE, n_threads=PIPE_THREADS):
+    load()
+    utterances = list(utterances)
+    docs = list(nlp.pipe(utterances, batch_size=batch_size, n_threads=n_threads))
+    dialog_acts = act_classifier.classify_batch(docs)
+    time_tags = tag_times([doc.text for doc in docs])
+    return [analyze(utterance, doc, dialog_act, tags)
+            for utterance, doc, dialog_act, tags in zip(utterances, docs, dialog_acts, time_tags)]
+
+
+################
+# RESULT CACHE #
+################
+
+
+EXTRACT_CACHE_BYTES = 16 * 1024 * 1024
+
+# one-word answers to yes/no and cabin class questions. They and their
+# capitalized and punctuated variants contain no date, so their extract_info
+# results hold on every day and are computed once, see build_answer_table().
+ANSWER_WORDS = ['yes', 'yeah', 'yep', 'sure', 'ok', 'okay', 'no', 'nope', 'nah',
+                'economy', 'coach', 'premium', 'deluxe', 'business', 'first']
+
+
+def answer_variants(word):
+    return [variant + punctuation for variant in (word, word.capitalize()) for punctuation in ('', '.', '!')]
+
+
+ANSWER_UTTERANCES = sorted(variant for word in ANSWER_WORDS for variant in answer_variants(word))
+
+
+# collapses whitespace, utterances that only differ in whitespace share results
+def normalize_utterance(utterance):
+    return ' '.join(utterance.split())
+
+
+# caches the extract_info results of repeated utterances per utterance and day,
+# as dates are resolved relative to today, and answers the one-word answers
+# from a table once it was built
+class ExtractCache:
+    def __init__(self, extract, extract_batch, max_bytes=EXTRACT_CACHE_BYTES, today=datetime.date.today):
+        self._extract = extract
+        self._extract_batch = extract_batch
+        self.today = today
+        self.cache = LRUCache(max_bytes)
+        self.day = None  # all cached results are relative to this day
+        self.answer_table = {}  # {str: {str: object}}
+        self.answer_table_hits = 0
+        self._lock = threading.Lock()  # guards day, answer_table and answer_table_hits
+
+    # runs extract_info for all ANSWER_UTTERANCES at once
+    def build_answer_table(self):
+        table = dict(zip(ANSWER_UTTERANCES, self._extract_batch(ANSWER_UTTERANCES)))
+        with self._lock:
+            self.answer_table = table
+
+    # extract_info through the answer table and the cache, the result is a copy
+    # the caller may modify
+    def extract_info(self, utterance):
+        utterance = normalize_utterance(utterance)
+        today = self.today()
+        with self._lock:
+            answer = self.answer_table.get(utterance)
+            if answer is not None:
+                self.answer_table_hits += 1
+            elif today != self.day:
+                self.cache.clear()
+                self.day = today
+        if answer is not None:
+            return copy.deepcopy(answer)
+        key = (utterance, today)
+        data = self.cache.get(key)
+        if data is None:
+            data = self._extract(utterance)
+            self.cache.put(key, data)
+        return copy.deepcopy(data)
+
+    # statistics to size the cache, the answer table counts as hits
+    def stats(self):
+        stats = self.cache.stats()
+        with self._lock:
+            stats['answer_table_hits'] = self.answer_table_hits
+            stats['answer_table_entries'] = len(self.answer_table)
+        hits = stats['hits'] + stats['answer_table_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups > 0 else 0.
+        return stats
+
+
+extract_cache = ExtractCache(extract_info, extract_info_batch)
+
+
+def cached_extract_info(utterance):
+    return extract_cache.extract_info(utterance)
+
+
+def cache_stats():
+    return extract_cache.stats()
+
+
 ##############
 # MAIN DEBUG #
 ##############
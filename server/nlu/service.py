@@ -0,0 +1,100 @@
+# service.py
+# Loads the NLU models (spaCy, SUTime, the dialog act classifier) once per
+# process. The server starts loading in the background when it starts, so the
+# first utterance does not wait for the models unless it arrives very early.
+
+import threading
+import time
+import traceback
+
+NOT_LOADED = 'not loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+# imports nlu.nlu inside the loader, importing spacy alone takes seconds
+def load_models():
+    from nlu import act_classifier, nlu
+    nlu.load()
+    act_classifier.get_worker()
+
+
+# precomputes the one-word answers once the models are ready
+def warm_up_models():
+    from nlu import nlu
+    nlu.extract_cache.build_answer_table()
+
+
+def nlu_cache_stats():
+    from nlu import nlu
+    return nlu.cache_stats()
+
+
+class NLUService:
+    def __init__(self, load=load_models, cache_stats=None, warm_up=None):
+        self.load = load
+        self.warm_up = warm_up  # run by the loader thread after the models are ready
+        self.cache_stats = cache_stats  # statistics of the result cache once ready
+        self.state = NOT_LOADED
+        self.error = None  # message of the exception that made loading fail
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()  # set once loading succeeded or failed
+
+    # starts loading the models in a background thread, later calls do nothing
+    def preload(self):
+        with self._lock:
+            if self.state != NOT_LOADED:
+                return
+            self.state = LOADING
+        thread = threading.Thread(target=self._run, name='nlu-preload', daemon=True)
+        thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.load()
+            self.state = READY
+        except Exception as e:
+            traceback.print_exc()
+            self.error = '%s: %s' % (type(e).__name__, e)
+            self.state = FAILED
+        self.load_seconds = time.perf_counter() - start
+        self._loaded.set()
+        if self.ready() and self.warm_up is not None:
+            # utterances arriving meanwhile are answered without the warm-up
+            try:
+                self.warm_up()
+            except Exception:
+                traceback.print_exc()
+
+    # whether loading finished, successfully or not
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def ready(self) -> bool:
+        return self.state == READY
+
+    # blocks until loading finished or the timeout passed, returns ready()
+    def wait(self, timeout: float = None) -> bool:
+        self.preload()
+        self._loaded.wait(timeout)
+        return self.ready()
+
+    def status(self) -> {str: object}:
+        status = {'state': self.state, 'error': self.error, 'load_seconds': self.load_seconds}
+        if self.ready() and self.cache_stats is not None:
+            status['cache'] = self.cache_stats()
+        return status
+
+    # extract_info results are cached, the caller gets its own copy
+    def extract_info(self, utterance: str) -> {str: object}:
+        if not self.wait():
+            raise RuntimeError('NLU models could not be loaded (%s)' % self.error)
+        from nlu.nlu import cached_extract_info
+        return cached_extract_info(utterance)
+
+
+# shared by all dialogue sessions of the server
+nlu_service = NLUService(load_models, nlu_cache_stats, warm_up_models)
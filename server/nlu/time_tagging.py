@@ -0,0 +1,232 @@
+# time_tagging.py
+# Tags dates and times of utterances with SUTime. Every call runs the CoreNLP
+# pipeline over its input, so the utterances of a batch are joined into one
+# document per chunk and the tags are mapped back to their utterances by offset.
+# Tags are cached per text and day, as SUTime resolves relative dates to today,
+# and SUTime can run in a worker process of its own instead of this process.
+
+import copy
+import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from nlu import config
+from qpx.lru import LRUCache
+
+# two newlines are a sentence break for the CoreNLP sentence splitter and SUTime
+# tags each sentence on its own
+SEPARATOR = '\n\n'
+
+# number of utterances joined into one SUTime call
+TAG_CHUNK = 100
+
+TAGS_CACHE_BYTES = 8 * 1024 * 1024
+
+# number of texts a tagger process parses before it is replaced by a new one,
+# bounds the memory the CoreNLP caches of a long-running JVM grow to
+RECYCLE_REQUESTS = 50000
+
+
+# length of a text in UTF-16 code units, the unit of the offsets CoreNLP returns
+def java_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+# index in text of the character at a CoreNLP offset
+def python_offset(text, offset):
+    if len(text) == java_length(text):
+        return offset
+    return len(text.encode('utf-16-le')[:2 * offset].decode('utf-16-le', errors='ignore'))
+
+
+# splits the tags of a joined document by the utterance they lie in, None if
+# a tag spans the separator between two utterances
+def split_tags(tags, texts):
+    starts = []
+    start = 0
+    for text in texts:
+        starts.append(start)
+        start += java_length(text) + len(SEPARATOR)
+    results = [[] for _ in texts]
+    position = 0
+    for tag in sorted(tags, key=lambda tag: tag['start']):
+        while position + 1 < len(texts) and starts[position + 1] <= tag['start']:
+            position += 1
+        offset = starts[position]
+        if tag['end'] > offset + java_length(texts[position]):
+            return None
+        tag = dict(tag)
+        tag['start'] -= offset
+        tag['end'] -= offset
+        results[position].append(tag)
+    return results
+
+
+# SUTime tags of each text, in the same order, as returned by parse(text) for
+# each text on its own
+def parse_batch(parse, texts, chunk=TAG_CHUNK):
+    texts = list(texts)
+    results = []
+    for start in range(0, len(texts), chunk):
+        part = texts[start:start + chunk]
+        # a text containing the separator would be split into two sentences
+        if len(part) == 1 or any(SEPARATOR in text for text in part):
+            results.extend(parse(text) for text in part)
+            continue
+        tags = split_tags(parse(SEPARATOR.join(part)), part)
+        if tags is None:
+            tags = [parse(text) for text in part]
+        results.extend(tags)
+    return results
+
+
+# SUTime in this process through JPype
+def start_sutime():
+    import sutime
+    return sutime.SUTime(config.SUTIME_JARS, mark_time_ranges=True)
+
+
+# runs this module as a tagger process, see TaggerProcess
+def tagger_command():
+    return [sys.executable, '-m', 'nlu.time_tagging', 'serve']
+
+
+# SUTime in a child process with its own JVM. It answers "ready" once SUTime is
+# loaded and then one JSON line with the tags of each JSON encoded text it
+# reads, or a JSON object with the error.
+class TaggerProcess:
+    def __init__(self, command):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        universal_newlines=True, bufsize=1,
+                                        cwd=os.path.dirname(config.NLU_DIRECTORY))
+        if self.process.stdout.readline().strip() != 'ready':
+            self.close()
+            raise RuntimeError('SUTime tagger process did not start.')
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def parse(self, text):
+        with self.lock:
+            self.requests += 1
+            self.process.stdin.write(json.dumps(text) + '\n')
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        if line == '':
+            raise RuntimeError('SUTime tagger process exited.')
+        result = json.loads(line)
+        if isinstance(result, dict):
+            raise RuntimeError('SUTime tagger process failed: ' + result['error'])
+        return result
+
+    def close(self):
+        if self.alive():
+            self.process.stdin.close()
+            self.process.wait()
+
+
+# parses through a tagger process that is started on first use, restarted if
+# it exited and replaced after recycle_after texts
+class TaggerWorker:
+    def __init__(self, command=None, recycle_after=RECYCLE_REQUESTS):
+        self.command = command or tagger_command()
+        self.recycle_after = recycle_after
+        self.process = None
+        self._lock = threading.Lock()
+
+    def get_process(self):
+        with self._lock:
+            if self.process is not None and (not self.process.alive()
+                                             or self.process.requests >= self.recycle_after):
+                self.process.close()
+                self.process = None
+            if self.process is None:
+                self.process = TaggerProcess(self.command)
+            return self.process
+
+    def parse(self, text):
+        return self.get_process().parse(text)
+
+    # replaces the tagger process, e.g. after the JVM ran out of memory
+    def recycle(self):
+        with self._lock:
+            if self.process is not None:
+                self.process.close()
+                self.process = None
+
+
+# caches the tags of a parse function per stripped text and day. SUTime is
+# whitespace insensitive, so surrounding whitespace only shifts the offsets.
+class TimeTagger:
+    def __init__(self, parse, max_bytes=TAGS_CACHE_BYTES, today=datetime.date.today):
+        self._parse = parse
+        self.today = today
+        self.cache = LRUCache(max_bytes)
+        self.day = None  # all cached tags are relative to this day
+        self._lock = threading.Lock()  # guards day and clearing the cache
+
+    # the cache key of a text, clears the cache when the day changed
+    def key(self, text):
+        today = self.today()
+        with self._lock:
+            if today != self.day:
+                self.cache.clear()
+                self.day = today
+        return text.strip(), today
+
+    def parse(self, text):
+        return self.parse_batch([text])[0]
+
+    def parse_batch(self, texts):
+        texts = list(texts)
+        keys = [self.key(text) for text in texts]
+        tags = {}  # {(str, datetime.date): [{str: object}]}
+        for key in keys:
+            if key not in tags:
+                tags[key] = self.cache.get(key)
+        missing = [key for key, cached in tags.items() if cached is None]
+        for key, parsed in zip(missing, parse_batch(self._parse, [text for text, _ in missing])):
+            self.cache.put(key, parsed)
+            tags[key] = parsed
+        return [shift_tags(tags[key], java_length(text) - java_length(text.lstrip()))
+                for text, key in zip(texts, keys)]
+
+    def stats(self):
+        stats = self.cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups > 0 else 0.
+        return stats
+
+
+# copies of the tags with their offsets moved by shift, callers may modify them
+def shift_tags(tags, shift):
+    tags = copy.deepcopy(tags)
+    for tag in tags:
+        tag['start'] += shift
+        tag['end'] += shift
+    return tags
+
+
+# tagger process loop, reads texts from stdin until it is closed
+def serve():
+    tagger = start_sutime()
+    print('ready', flush=True)
+    for line in sys.stdin:
+        try:
+            result = tagger.parse(json.loads(line))
+        except Exception as e:
+            result = {'error': '%s: %s' % (type(e).__name__, e)}
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['serve']:
+        serve()
+    else:
+        print('Usage: python -m nlu.time_tagging serve')
+        sys.exit(1)
@@ -1,10 +1,13 @@
 // DialogActClassifier.java
 // arguments: <model file path> <utterance file path>
+//        or: <model file path> to keep the model loaded and classify utterances from stdin
 
 import java.io.BufferedReader;
 import java.io.FileReader;
+import java.io.InputStreamReader;
 import java.io.ObjectInputStream;
 import java.io.FileInputStream;
+import java.io.StringReader;
 import weka.core.Instances;
 import weka.core.Instance;
 import weka.classifiers.trees.J48;
@@ -16,6 +19,10 @@ class DialogActClassifier {
     public static void main(String[] args) {
         try {
             FilteredClassifier tree = (FilteredClassifier) SerializationHelper.read(args[0]);
+            if (args.length < 2) {
+                serve(tree);
+                return;
+            }
             Instances unlabeled = new Instances(new BufferedReader(new FileReader(args[1])));
             unlabeled.setClassIndex(unlabeled.numAttributes() - 1);
             Instances labeled = new Instances(unlabeled);
@@ -30,4 +37,34 @@ class DialogActClassifier {
             e.printStackTrace();
         }
     }
-}
\ No newline at end of file
+
+    // Reads the ARFF header up to @data from stdin once and answers with "ready".
+    // Afterwards every line on stdin is an ARFF data line that is answered with
+    // the predicted act tag, or "error" if it could not be classified.
+    private static void serve(FilteredClassifier tree) throws Exception {
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, "UTF-8"));
+        StringBuilder header = new StringBuilder();
+        String line;
+        while ((line = in.readLine()) != null) {
+            header.append(line).append('\n');
+            if (line.trim().equalsIgnoreCase("@data")) {
+                break;
+            }
+        }
+        System.out.println("ready");
+        System.out.flush();
+        while ((line = in.readLine()) != null) {
+            try {
+                Instances unlabeled = new Instances(new StringReader(header + line));
+                unlabeled.setClassIndex(unlabeled.numAttributes() - 1);
+                double clsLabel = tree.classifyInstance(unlabeled.instance(0));
+                System.out.println(unlabeled.classAttribute().value((int) clsLabel));
+            }
+            catch (Exception e) {
+                e.printStackTrace();
+                System.out.println("error");
+            }
+            System.out.flush();
+        }
+    }
+}
@@ -24,7 +24,11 @@ def convert_tag(corpus_tag):
 	else:
 		return None
 
-posts = nps_chat.xml_posts()
+# posts spaCy parses at once and its number of threads
+PIPE_BATCH_SIZE = 1000
+PIPE_THREADS = 4
+
+posts = [post for post in nps_chat.xml_posts() if post.get('class') in EQUIVALENT_TAGS]
 nlp = spacy.load('en')
 
 output = ['@relation DIALOG_UTTERANCES',
@@ -68,8 +72,7 @@ def check_if_has_negative(text):
 			return 'true'
 	return 'false'
 
-def format(post):
-	doc = nlp(post.text)
+def format(post, doc):
 	doc_text = re.sub('[\d\-]+.*User.*\d+', 'USERNAME', post.text)
 	doc_text = re.sub('[^\w \.,\'\?!]', '', doc_text)
 	has_question_mark = 'true' if '?' in doc_text else 'false'
@@ -82,7 +85,8 @@ def format(post):
 	counts[act_tag] += 1
 	return '"{}",{},{},{},{},{}'.format(doc_text, has_question_mark, has_affirmative, has_negative, starting_pos, act_tag)
 
-output.extend([format(post) for post in posts if post.get('class') in EQUIVALENT_TAGS])
+docs = nlp.pipe((post.text for post in posts), batch_size=PIPE_BATCH_SIZE, n_threads=PIPE_THREADS)
+output.extend([format(post, doc) for post, doc in zip(posts, docs)])
 
 with open('training_data.arff', 'w') as f:
 	f.write('\n'.join(output))
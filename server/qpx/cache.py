@@ -0,0 +1,110 @@
+import sys, json, os, gzip, hashlib, tempfile, threading
+
+# responses are stored as gzip-compressed compact JSON named after their request key
+CACHE_EXTENSION = ".json.gz"
+LEGACY_EXTENSION = ".json"
+COMPRESS_LEVEL = 6
+
+
+# canonical key of a QPX request, independent of key order
+def request_key(request) -> str:
+    request_dump = json.dumps(request["request"], sort_keys=True)
+    return hashlib.sha1(request_dump.encode("utf8")).hexdigest()
+
+
+# on-disk store of QPX responses that supports random access by request key
+class ResponseCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._index = None  # {str: str} maps request keys to file names
+        self._lock = threading.RLock()
+
+    # builds the index once, afterwards it is kept up to date by put().
+    # Compressed files are indexed by their name, only files in the legacy
+    # indented JSON format have to be read to find their request.
+    def index(self) -> {str: str}:
+        with self._lock:
+            if self._index is None:
+                index = {}
+                files = os.listdir(self.directory)
+                for file in files:
+                    if file.endswith(CACHE_EXTENSION):
+                        index[file[:-len(CACHE_EXTENSION)]] = file
+                for file in files:
+                    if not file.endswith(LEGACY_EXTENSION):
+                        continue
+                    cached = json.load(open(os.path.join(self.directory, file), "r"))
+                    if "request" in cached:
+                        index.setdefault(request_key(cached), file)
+                self._index = index
+            return self._index
+
+    def __contains__(self, key: str):
+        return key in self.index()
+
+    def load(self, file: str) -> object:
+        path = os.path.join(self.directory, file)
+        if file.endswith(CACHE_EXTENSION):
+            with gzip.open(path, "rt", encoding="utf8") as f:
+                return json.load(f)
+        return json.load(open(path, "r"))
+
+    # returns the cached response and the file it was read from, (None, None) on a miss
+    def get(self, key: str) -> (object, str):
+        file = self.index().get(key)
+        if file is None:
+            return None, None
+        return self.load(file)["response"], file
+
+    # writes the response once per request key, writing an already cached
+    # request again keeps the existing file
+    def put(self, request, response) -> str:
+        key = request_key(request)
+        file = key + CACHE_EXTENSION
+        path = os.path.join(self.directory, file)
+        with self._lock:
+            if not os.path.isfile(path):
+                cached = {"request": request["request"], "response": response}
+                # write to a temporary file first so that readers never see a partial file
+                fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+                try:
+                    with os.fdopen(fd, "wb") as raw, \
+                            gzip.open(raw, "wt", encoding="utf8", compresslevel=COMPRESS_LEVEL) as f:
+                        json.dump(cached, f, separators=(",", ":"))
+                    os.replace(temp_path, path)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+            self.index()[key] = file
+        return file
+
+    # converts all legacy cache files to the compressed format and removes them,
+    # returns the number of converted files
+    def migrate(self) -> int:
+        converted = 0
+        for file in sorted(os.listdir(self.directory)):
+            if not file.endswith(LEGACY_EXTENSION):
+                continue
+            cached = self.load(file)
+            if "request" not in cached or "response" not in cached:
+                continue
+            key = request_key(cached)
+            if not os.path.isfile(os.path.join(self.directory, key + CACHE_EXTENSION)):
+                self.put(cached, cached["response"])
+            os.remove(os.path.join(self.directory, file))
+            converted += 1
+        self._index = None
+        return converted
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != "migrate":
+        print("Usage: python -m qpx.cache migrate [cache directory]")
+        sys.exit(1)
+    directory = argv[2] if len(argv) > 2 else os.path.dirname(__file__) + "/cache/"
+    converted = ResponseCache(directory).migrate()
+    print("Converted %i cache files in %s." % (converted, directory))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
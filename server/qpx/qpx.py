@@ -1,42 +1,80 @@
-import sys, requests, uuid, json, os
+import sys, requests, json, os, threading
 from colorama import Fore
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from qpx.cache import ResponseCache, request_key
+from qpx.lru import LRUCache
+from qpx.singleflight import SingleFlight
+
+
+QPX_URL = 'https://www.googleapis.com/qpxExpress/v1/trips/search?fields=kind%2Ctrips&key='
+
+# seconds until connecting to and reading from QPX time out
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+# failed connections and 5xx responses are retried with exponential backoff
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+# number of kept-alive connections to QPX
+POOL_SIZE = 16
+
+_api_key = None
+_session = None
+_session_lock = threading.Lock()
+
+# identical requests that are in flight at the same time share one call
+_requests_in_flight = SingleFlight()
+_extractions_in_flight = SingleFlight()
+
+# on-disk store of all QPX responses
+response_cache = ResponseCache(os.path.dirname(__file__) + "/cache/")
+
+# extracted flight lists shared by all sessions, keyed by request_key()
+FLIGHTS_CACHE_BYTES = 512 * 1024 * 1024
+flights_cache = LRUCache(FLIGHTS_CACHE_BYTES)
 
 
 def get_flights(request):
-    try:
-        key = "".join(open(os.path.dirname(__file__) + "/api.key", "r").readlines()).strip()
-    except:
-        key = None
+    # search cache for query
+    cache_key = request_key(request)
+    response, file = response_cache.get(cache_key)
+    if response is not None:
+        print(Fore.LIGHTBLACK_EX + "Found matching cache file %s." % file + Fore.BLACK)
+        return response
+    return _requests_in_flight.do(cache_key, query_qpx, request)
+
+
+# sends the request to QPX and caches the response, concurrent identical
+# requests are coalesced by get_flights
+def query_qpx(request):
+    # the response may have been cached while waiting for another request
+    response, _ = response_cache.get(request_key(request))
+    if response is not None:
+        return response
+
+    key = api_key()
     if key is None:
         print("Could not read QPX key from file \"api.key\".")
         sys.exit(1)
-    # else:
-    #     print("Using API key %s." % key)
 
-    # search cache for query
-    request_dump = json.dumps(request["request"], sort_keys=True)
-    for base, _, files in os.walk(os.path.dirname(__file__) + "/cache/"):
-        for file in files:
-            cached = json.load(open(os.path.dirname(__file__) + "/cache/" + file, "r"))
-            # print(request_dump)
-            # print(json.dumps(cached["request"], sort_keys=True))
-            if "request" in cached and json.dumps(cached["request"], sort_keys=True) == request_dump:
-                print(Fore.LIGHTBLACK_EX + "Found matching cache file %s." % file + Fore.BLACK)
-                return cached["response"]
-
-    r = requests.post(
-        'https://www.googleapis.com/qpxExpress/v1/trips/search?fields=kind%2Ctrips&key=' + key,
-        json=request)
+    try:
+        r = session().post(QPX_URL + key, json=request, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    except requests.RequestException as e:
+        print(Fore.RED, e,
+              "\nQPX Query failed for request",
+              json.dumps(request, indent=4),
+              Fore.WHITE)
+        return None
     if r.status_code != 200:
         print(Fore.RED, r, r.reason,
               "\nQPX Query failed for request",
               json.dumps(request, indent=4),
               Fore.WHITE)
     else:
-        cache = request
-        cache["response"] = r.json()
-        json.dump(cache, open(os.path.dirname(__file__) + "/cache/%s.json" % str(uuid.uuid4()), "w"), indent=4)
-        return r.json()
+        response = r.json()
+        response_cache.put(request, response)
+        return response
     return None
 
 
@@ -80,9 +118,8 @@ def extract_flights(response):
                 seg["connectionDuration"] = segment["connectionDuration"] if "connectionDuration" in segment else 0
                 seg["legs"] = []
                 for li, leg in enumerate(segment["leg"]):
-                    l = leg
-                    del l["kind"]
-                    del l["id"]
+                    # copy, the response may be shared with other callers
+                    l = {p: value for p, value in leg.items() if p not in ["kind", "id"]}
                     seg["legs"].append(l)
                     flight["legs"] += 1
                     flight["aircraftTypes"].add(leg["aircraft"])
@@ -94,8 +131,8 @@ def extract_flights(response):
         flight["carriers"] = list(flight["carriers"])
         flight["aircraftTypes"] = list(flight["aircraftTypes"])
         flight["nonstop"] = flight["legs"] == 1
-        flight["passengers"] = tripOption["pricing"][0]["passengers"]
-        del flight["passengers"]["kind"]
+        flight["passengers"] = {p: value for p, value in tripOption["pricing"][0]["passengers"].items()
+                                if p != "kind"}
 
         flight["origin"] = get_origin(flight["slices"][0])
         flight["type"] = "single" if len(flight["slices"]) == 1 else "multi"
@@ -119,6 +156,58 @@ def extract_flights(response):
     return flights
 
 
+# reads the QPX API key from the "api.key" file once, None if it cannot be read
+def api_key() -> str:
+    global _api_key
+    if _api_key is None:
+        try:
+            _api_key = "".join(open(os.path.dirname(__file__) + "/api.key", "r").readlines()).strip()
+        except:
+            return None
+    return _api_key
+
+
+def create_session(retries: int = RETRIES, backoff: float = RETRY_BACKOFF, pool_size: int = POOL_SIZE) -> requests.Session:
+    retry = Retry(total=retries,
+                  backoff_factor=backoff,
+                  status_forcelist=[500, 502, 503, 504],
+                  allowed_methods=frozenset(["POST"]),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+# long-lived HTTP session shared by all QPX requests, keeps connections alive
+def session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+    return _session
+
+
+# extract_flights(get_flights(request)) behind the in-memory flights cache,
+# callers get their own list but share the flight dicts, which must not be modified
+def search_flights(request):
+    key = request_key(request)
+    flights = flights_cache.get(key)
+    if flights is None:
+        flights = _extractions_in_flight.do(key, _search_flights, key, request)
+        if flights is None:
+            return None
+    return list(flights)
+
+
+def _search_flights(key, request):
+    flights = extract_flights(get_flights(request))
+    if flights is not None:
+        flights_cache.put(key, flights)
+    return flights
+
+
 def stringify(flight):
     def intermediate_stops(flight, origin, destination):
         im = set()
@@ -1,7 +1,13 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
 from typing import Union
 
 from qpx import qpx
-from dialogue.database import Database
+from dialogue.database import Database, AsyncDatabase
+
+# bounds the number of concurrent QPX calls of all AsyncQPXDatabase instances
+QPX_WORKERS = 8
+qpx_executor = ThreadPoolExecutor(max_workers=QPX_WORKERS)
 
 
 class QPXDatabase(Database):
@@ -24,4 +30,19 @@ class QPXDatabase(Database):
         return request
 
     def query(self, query: {str: Union[str, int, float]}):
-        return qpx.extract_flights(qpx.get_flights(self.build_request(query)))
+        return qpx.search_flights(self.build_request(query))
+
+
+# QPXDatabase for the event loop, the blocking QPX client runs in a bounded
+# pool of worker threads so that awaiting a query never blocks the loop
+class AsyncQPXDatabase(AsyncDatabase):
+    def __init__(self, executor: Executor = qpx_executor):
+        self.database = QPXDatabase()
+        self.executor = executor
+
+    def build_request(self, query: {str: Union[str, int, float]}) -> object:
+        return self.database.build_request(query)
+
+    async def query(self, query: {str: Union[str, int, float]}):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.database.query, query)
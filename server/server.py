@@ -3,7 +3,11 @@
 
 from system import Pipeline
 from dialogue.manager import DialogueTurn
+from nlu import ResolveAirport
+from nlu.service import nlu_service
+from qpx import qpx
 
+import glob
 import json
 import os
 import uuid
@@ -11,7 +15,7 @@ import threading
 
 from datetime import datetime
 import eventlet
-from flask import Flask, send_from_directory, session, request
+from flask import Flask, send_from_directory, session, request, jsonify
 from flask_socketio import SocketIO, emit
 
 
@@ -28,6 +32,8 @@ class DialogueSession:
         self.started = str(datetime.now())
         self.ended = ""
         self.system = Pipeline()
+        # wait for database queries without blocking the other sessions
+        self.system.manager.sleep = eventlet.sleep
 
     def json(self) -> object:
         return {
@@ -55,6 +61,12 @@ def hello():
     return app.send_static_file('index.html')
 
 
+# whether the NLU models are loaded, e.g. for load balancer health checks
+@app.route('/status')
+def status():
+    return jsonify(nlu=nlu_service.status(), ready=nlu_service.ready())
+
+
 @socketio.on('stateUpdateFeedback')
 def state_update_feedback(feedback):
     print("Got state update feedback", feedback)
@@ -160,4 +172,14 @@ def socket_disconnect():
 
 
 if __name__ == '__main__':
+    # resolve frequent cities and the locations of past sessions ahead of time. This
+    # forks a pool of worker processes, so it runs before any other thread starts.
+    warm_up_queries = ResolveAirport.queries_from_python_list("test/test_dialog_questions.py")
+    for filename in glob.glob("log-*.json"):
+        warm_up_queries += ResolveAirport.queries_from_session_log(filename)
+    print("Resolved %i airport queries in advance." % ResolveAirport.warm_up(warm_up_queries))
+    # load spaCy, SUTime and the dialog act classifier while the QPX cache is indexed
+    nlu_service.preload()
+    # index the QPX response cache before the first session needs it
+    qpx.response_cache.index()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
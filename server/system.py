@@ -5,16 +5,22 @@ from typing import Union, Generator, Tuple
 
 import sys, re
 
-from nlu.ResolveAirport import find_matches
-# from nlu.nlu import extract_info
+from nlu.ResolveAirport import find_matches, find_matches_batch
+from nlu.service import nlu_service
 from dialogue.manager import Manager, DialogueTurn
 from dialogue.field import Field, NumField, NumCategory
 from nlg.nlg import Speaker
 from nlg.results_verbalizer import verbalize
-from qpx_database import QPXDatabase
+from qpx_database import AsyncQPXDatabase
 
 OutputType = Enum('OutputType', 'greeting progress error feedback question finish review')
 
+# number of best matching airports of a question that reviews are looked up for
+REVIEW_AIRPORTS = 10
+
+# seconds between checks whether the NLU models finished loading
+NLU_POLL_INTERVAL = 0.1
+
 
 class Output:
     def __init__(self,
@@ -58,7 +64,7 @@ class Pipeline:
             minimal_fields=[
                 Destination.name, Origin.name, DepartureDate.name
             ],
-            database=QPXDatabase())
+            database=AsyncQPXDatabase())
         self.speaker = Speaker(self.manager)
         self.last_question = None
         self.expected_answer = None
@@ -88,21 +94,25 @@ class Pipeline:
             "in_date": "Arrival Date",
             "cabin_class": "Cabin Class",
         }
+        # resolve all airport mentions of the statement at once
+        locations = {}
+        for key, value in statement.items():
+            if key in ['o_location', 'o_entity', 'd_location', 'd_entity']:
+                locations[key] = value
+            elif (key == 'u_location' or key == 'u_entity') and self.last_question.name in ["Origin", "Destination"]:
+                locations[key] = value[0]
+        if len(locations) > 0:
+            yield Output(lines=["Resolving airport codes..."], output_type=OutputType.progress)
+            # no limit: the MeanShift clustering in Field.prune needs the scores of the full ranking
+            locations = dict(zip(locations.keys(), find_matches_batch(list(locations.values()))))
+
         for key, value in statement.items():
             if key == 'o_location' or key == 'o_entity':
-                yield Output(lines=["Resolving origin airport code..."], output_type=OutputType.progress)
-                airports = find_matches(value)
-                status = yield from self.manager.inform("Origin", airports)
+                status = yield from self.manager.inform("Origin", locations[key])
             elif key == 'd_location' or key == 'd_entity':
-                yield Output(lines=["Resolving destination airport code..."], output_type=OutputType.progress)
-                airports = find_matches(value)
-                status = yield from self.manager.inform("Destination", airports)
-            elif (key == 'u_location' or key == 'u_entity') and self.last_question.name in ["Origin", "Destination"]:
-                which = self.last_question.name
-                yield Output(lines=["Resolving %s airport code..." % which.lower()],
-                             output_type=OutputType.progress)
-                airports = find_matches(value[0])
-                status = yield from self.manager.inform(which, airports)
+                status = yield from self.manager.inform("Destination", locations[key])
+            elif key in locations:
+                status = yield from self.manager.inform(self.last_question.name, locations[key])
             elif key in direct_nlu_matches:
                 status = yield from self.manager.inform(direct_nlu_matches[key], [(value, 1)])
             elif key == "u_date" and self.last_question.name in ["Departure Date", "Arrival Date"]:
@@ -136,8 +146,8 @@ class Pipeline:
         print("Interpreting question", question)
         for key, value in question.items():
             if key == 'u_location' or key == 'u_entity':
-                for v in value:
-                    for code, _ in find_matches(v):
+                for matches in find_matches_batch(value, limit=REVIEW_AIRPORTS):
+                    for code, _ in matches:
                         airport = find_airport_by_code(code)
                         if airport is None:
                             print("Could not extract airport from", code)
@@ -186,10 +196,14 @@ class Pipeline:
         if self.last_question is None:
             yield from self.output()
 
-        yield Output(lines=["Loading NLU libraries..."],
-                     output_type=OutputType.progress)
-        from nlu.nlu import extract_info
-        extracted = extract_info(utterance)
+        if not nlu_service.ready():
+            yield Output(lines=["Loading NLU libraries..."],
+                         output_type=OutputType.progress)
+            nlu_service.preload()
+            # let the other sessions run while the models are loaded in the background
+            while not nlu_service.loaded():
+                self.manager.sleep(NLU_POLL_INTERVAL)
+        extracted = nlu_service.extract_info(utterance)
         utterance = utterance.lower()
         print('Utterance:', utterance)
         print('Extracted:', extracted)
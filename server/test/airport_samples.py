@@ -0,0 +1,63 @@
+import numbers, random
+
+from nlu import ResolveAirport
+from nlu.ResolveAirport import column_scores, score
+
+
+# queries whose best airports share few rare characters with them and are
+# outranked on common words like "airport" by many other rows
+HARD_QUERIES = ["AEro Aiport", "Kyle Airort", "airport", "international airport"]
+
+
+# same kinds of queries as test_resolve_airports.py: name, city and "city, country"
+# with randomly removed characters
+def sample_queries(num_airports=3, remove_characters=1, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for size in range(1, 4):
+        selection = [airport for airport in ResolveAirport.available_options
+                     if airport["Size"] == size and len(airport["Code"]) == 3 and len(airport["City"]) > 3 + remove_characters]
+        for airport in rng.sample(selection, num_airports // 3 or 1):
+            for query in [airport["Name"], airport["City"], "{City:s}, {Country:s}".format(**airport)]:
+                for i in range(remove_characters):
+                    remove = rng.randint(0, len(query))
+                    query = query[:remove] + query[remove + 1:]
+                queries.append(query)
+    return queries
+
+
+# scoring loop of find_matches before the airport table was normalized at load time
+def reference_rank(query: str, rows: [{str: object}]) -> [(str, float)]:
+    query = query.lower()
+    matches = []
+    for row in rows:
+        row_score = 0
+        row_multiplier = 1.  # higher weights for airports with IATA_FAA or ICAO number
+        row_multiplier *= row["Size"]
+        applicable_values = 0
+        for key, value in row.items():
+            if key == "Code" and (value is None or value == ""):
+                row_multiplier *= 0.05
+                break
+            if key not in ["Name", "Region", "Country", "City", "Code"]:
+                continue
+            if value is None or isinstance(value, numbers.Number):
+                continue
+            value = value.lower()
+            column_score = column_scores[key]
+            row_score += score(value, query) * column_score
+            for word in query.split():
+                if word in value:
+                    row_score += len(word) / len(query.split()) * column_score
+            for w1, w2 in zip(query.split(), query.split()[1:]):
+                word = "%s %s" % (w1, w2)
+                if word in value:
+                    row_score += len(word) / len(query.split()) * column_score
+            if query == value:
+                row_score += 50 if key == "Code" else 20
+            applicable_values += 1.
+        if applicable_values > 0:
+            row_score *= row_multiplier / applicable_values
+            if row_score > ResolveAirport.FUZZ_RATIO:
+                matches.append((row["Code"], row_score))
+    return sorted(matches, key=lambda entry: entry[1], reverse=True)
@@ -0,0 +1,48 @@
+import contextlib, io, sys, time
+
+from nlu import ResolveAirport
+from nlu.ResolveAirport import find_matches, find_matches_exhaustive, scoring_rows, available_options
+
+from test.airport_samples import sample_queries, reference_rank, HARD_QUERIES
+
+TOP_K = 10
+
+
+def timed(function, queries):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [function(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+# find_matches without reusing earlier results
+def uncached_matches(query, limit):
+    ResolveAirport.matches_cache.clear()
+    return find_matches(query, limit)
+
+
+def main(argv):
+    num_airports = int(argv[1]) if len(argv) > 1 else 3
+    queries = sample_queries(num_airports)
+    reference, reference_time = timed(lambda query: reference_rank(query, available_options), queries)
+    normalized, normalized_time = timed(find_matches_exhaustive, queries)
+    assert normalized == reference
+
+    print("%i queries against %i airports, identical rankings" % (len(queries), len(scoring_rows)))
+    print("%-12s %14s" % ("scoring", "per query (ms)"))
+    print("%-12s %14.1f" % ("reference", reference_time * 1000.))
+    print("%-12s %14.1f" % ("normalized", normalized_time * 1000.))
+
+    # rows pruned by their score bounds must not change the ranking
+    queries = [query for query in sample_queries(num_airports, seed=1) if len(query) != 3] + HARD_QUERIES
+    for limit in [TOP_K, None]:
+        exhaustive, exhaustive_time = timed(lambda query: find_matches_exhaustive(query, limit), queries)
+        pruned, pruned_time = timed(lambda query: uncached_matches(query, limit), queries)
+        assert pruned == exhaustive
+        print("%i queries, limit %s, identical rankings" % (len(queries), limit))
+        print("%-12s %14.1f" % ("exhaustive", exhaustive_time * 1000.))
+        print("%-12s %14.1f" % ("pruned", pruned_time * 1000.))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,52 @@
+import sys, time
+
+from nlu import time_tagging
+from nlu.nlu import fast_date_tags, parse_date
+
+# answers to the "Departure Date" and "Return Date" questions
+DATE_UTTERANCES = [
+    "tomorrow", "today", "Tomorrow.", "I want to leave tomorrow", "on monday", "Monday", "tuesday please",
+    "next tuesday", "next friday", "this saturday", "on sunday", "wednesday", "thursday", "Next Monday",
+    "in 3 days", "in two days", "in 10 days", "in a day", "returning in 5 days", "back on friday",
+    "2016-12-24", "2017-01-02", "on 2016-12-31", "I would like to fly on 2017-01-15",
+    "december 9th", "the day after tomorrow", "monday morning", "tomorrow at 5pm", "friday evening",
+    "next week", "in 2 weeks", "january 3", "the 24th", "monday to friday", "fly to boston tomorrow",
+]
+
+
+def timed(function, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [function(text) for text in texts]
+    return results, (time.perf_counter() - start) / repeat / len(texts)
+
+
+# the dates and positions extract_info derives from the tags
+def outcome(tags):
+    return [(tag["start"], tag["end"], parse_date(tag["value"]) if isinstance(tag["value"], str) else tag["value"])
+            for tag in tags]
+
+
+def main(argv):
+    repeat = int(argv[1]) if len(argv) > 1 else 3
+    sutime = time_tagging.start_sutime()
+    sutime.parse("warm up")
+    reference, sutime_time = timed(sutime.parse, DATE_UTTERANCES, repeat)
+    fast, fast_time = timed(fast_date_tags, DATE_UTTERANCES, repeat * 100)
+
+    decided = [(text, tags, expected) for text, tags, expected in zip(DATE_UTTERANCES, fast, reference)
+               if tags is not None]
+    agreeing = [text for text, tags, expected in decided if outcome(tags) == outcome(expected)]
+    for text, tags, expected in decided:
+        if text not in agreeing:
+            print("disagree: %r fast path %s, SUTime %s" % (text, tags, expected))
+
+    print("%i utterances, fast path decides %i, agrees with SUTime on %i"
+          % (len(DATE_UTTERANCES), len(decided), len(agreeing)))
+    print("%-12s %16s" % ("tagger", "per utterance (ms)"))
+    print("%-12s %16.3f" % ("SUTime", sutime_time * 1000.))
+    print("%-12s %16.3f" % ("fast path", fast_time * 1000.))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
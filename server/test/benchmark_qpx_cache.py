@@ -0,0 +1,50 @@
+import os, shutil, sys, tempfile, time
+
+from qpx.cache import ResponseCache
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "qpx", "cache")
+
+
+def disk_footprint(directory):
+    return sum(os.path.getsize(os.path.join(directory, file)) for file in os.listdir(directory))
+
+
+def measure(directory):
+    cache = ResponseCache(directory)
+    start = time.perf_counter()
+    keys = list(cache.index().keys())
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    per_hit = (time.perf_counter() - start) / max(1, len(keys))
+    return {
+        "files": len(keys),
+        "disk": disk_footprint(directory),
+        "startup": startup,
+        "per_hit": per_hit
+    }
+
+
+def main(argv):
+    source = argv[1] if len(argv) > 1 else CACHE_DIR
+    directory = tempfile.mkdtemp()
+    try:
+        for file in os.listdir(source):
+            shutil.copy(os.path.join(source, file), directory)
+
+        legacy = measure(directory)
+        ResponseCache(directory).migrate()
+        compressed = measure(directory)
+
+        print("%-12s %10s %12s %12s %12s" % ("format", "files", "disk (MB)", "startup (s)", "per hit (ms)"))
+        for name, result in [("json", legacy), ("json.gz", compressed)]:
+            print("%-12s %10i %12.2f %12.3f %12.3f" % (name, result["files"], result["disk"] / 1024. / 1024.,
+                                                       result["startup"], result["per_hit"] * 1000.))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,45 @@
+import sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from qpx import qpx
+from test.qpx_stub import StubQPXServer
+
+REQUEST = {
+    "request": {
+        "passengers": {"adultCount": 1},
+        "slice": [{"date": "2016-12-09", "origin": "LAX", "destination": "AMS"}]
+    }
+}
+
+
+def timed(post, url):
+    start = time.perf_counter()
+    post(url, json=REQUEST, timeout=(qpx.CONNECT_TIMEOUT, qpx.READ_TIMEOUT)).json()
+    return time.perf_counter() - start
+
+
+def run(post, url, num_requests, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return np.array(list(executor.map(lambda _: timed(post, url), range(num_requests))))
+
+
+def main(argv):
+    latency = float(argv[1]) if len(argv) > 1 else 0.05
+    num_requests = int(argv[2]) if len(argv) > 2 else 400
+    concurrency = int(argv[3]) if len(argv) > 3 else 8
+
+    with StubQPXServer(latency=latency) as server:
+        url = server.url + "benchmark"
+        print("%i requests, %i concurrent, %.0f ms simulated QPX latency" % (num_requests, concurrency, latency * 1000))
+        print("%-20s %10s %10s %10s %10s" % ("client", "p50 (ms)", "p95 (ms)", "p99 (ms)", "max (ms)"))
+        for name, post in [("requests.post", requests.post), ("pooled session", qpx.create_session().post)]:
+            durations = run(post, url, num_requests, concurrency) * 1000
+            print("%-20s %10.1f %10.1f %10.1f %10.1f" % (name, np.percentile(durations, 50), np.percentile(durations, 95),
+                                                         np.percentile(durations, 99), durations.max()))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
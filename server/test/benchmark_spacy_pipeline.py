@@ -0,0 +1,29 @@
+import sys, time
+
+from nlu.nlu import load_spacy, SPACY_OPTIONAL_COMPONENTS
+from nlu import config
+from test.profile_extract_info import UTTERANCES
+
+
+def measure(components, repeat):
+    start = time.perf_counter()
+    nlp = load_spacy(components=components)
+    startup = time.perf_counter() - start
+    nlp(UTTERANCES[0])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for utterance in UTTERANCES:
+            nlp(utterance)
+    return startup, (time.perf_counter() - start) / repeat / len(UTTERANCES)
+
+
+def main(argv):
+    repeat = int(argv[1]) if len(argv) > 1 else 20
+    print("%-40s %12s %20s" % ("components", "startup (s)", "per utterance (ms)"))
+    for components in [tuple(SPACY_OPTIONAL_COMPONENTS), config.SPACY_COMPONENTS]:
+        startup, per_utterance = measure(components, repeat)
+        print("%-40s %12.2f %20.3f" % (", ".join(components), startup, per_utterance * 1000.))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,67 @@
+import cProfile, pstats, sys, time
+from collections import OrderedDict
+
+from nlu import act_classifier, nlu
+from nlu.nlu import ParsedUtterance
+
+UTTERANCES = [
+    "I want to fly from Los Angeles to London on next Tuesday",
+    "I would prefer to fly premium coach class",
+    "I want to fly with American Airlines",
+    "the cheapest direct flight from AMS to LAX please",
+    "leaving on friday evening and returning on sunday",
+    "tomorrow", "yes", "no", "next wednesday", "business class to Tokyo in 3 days",
+]
+
+
+# seconds per utterance spent in each stage of extract_info
+def breakdown(utterances, repeat):
+    stages = OrderedDict((stage, 0.) for stage in [
+        "spacy", "dialog act", "time tags", "token pass", "entities", "iata", "cabin class", "qualifiers",
+        "dates and times", "numbers", "nlp(word) per tag (before)"])
+
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        stages[stage] += time.perf_counter() - start
+        return result
+
+    for _ in range(repeat):
+        for utterance in utterances:
+            doc = timed("spacy", nlu.nlp, utterance)
+            timed("dialog act", act_classifier.classify, doc)
+            # SUTime without the cache of the time tagger
+            tags = timed("time tags", nlu.time_tagger._parse, doc.text)
+            parsed = timed("token pass", ParsedUtterance, doc)
+            timed("entities", nlu.detect_entities, parsed)
+            timed("iata", nlu.detect_iata, parsed)
+            timed("cabin class", nlu.detect_cabin_class, parsed)
+            timed("qualifiers", nlu.detect_qualifiers, parsed)
+            indices, _ = timed("dates and times", nlu.detect_datetimes, parsed, tags)
+            timed("numbers", nlu.detect_numbers, utterance, indices)
+            # find_in_doc used to parse the first word of every tag again
+            for tag in tags:
+                timed("nlp(word) per tag (before)", nlu.nlp, tag['text'].split()[0])
+    count = repeat * len(utterances)
+    return OrderedDict((stage, seconds / count) for stage, seconds in stages.items())
+
+
+def main(argv):
+    repeat = int(argv[1]) if len(argv) > 1 else 5
+    nlu.load()
+    nlu.extract_info("warm up on monday")
+    print("%-28s %18s" % ("stage", "per utterance (ms)"))
+    for stage, seconds in breakdown(UTTERANCES, repeat).items():
+        print("%-28s %18.3f" % (stage, seconds * 1000.))
+
+    if "--cprofile" in argv:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for _ in range(repeat):
+            nlu.extract_info_batch(UTTERANCES)
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,61 @@
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+EMPTY_RESPONSE = {"kind": "qpxExpress#tripsSearch", "trips": {"kind": "qpxexpress#tripOptions"}}
+
+
+# local HTTP server that answers like the QPX search endpoint after a delay,
+# the first `failures` requests are answered with 503
+class StubQPXServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0., failures: int = 0, response: object = EMPTY_RESPONSE):
+        super().__init__(("127.0.0.1", 0), StubQPXHandler)
+        self.latency = latency
+        self.failures = failures
+        self.response = response
+        self.requests = []
+        self.connections = set()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%i/qpxExpress/v1/trips/search?key=" % self.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class StubQPXHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body in one packet like a real server
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append(json.loads(body.decode("utf8")))
+        self.server.connections.add(self.client_address)
+        time.sleep(self.server.latency)
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            self.reply(503, {"error": "backend unavailable"})
+        else:
+            self.reply(200, self.server.response)
+
+    def reply(self, status: int, payload: object):
+        data = json.dumps(payload).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,98 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from nlu import act_classifier
+from nlu.act_classifier import ClassifierProcess, Features, extract_features, format_instance, classify_features
+
+# answers like DialogActClassifier in stdin mode, but with the utterance text
+# instead of an act tag so that every answer can be traced to its utterance
+STUB_CLASSIFIER = '''
+import sys
+for line in sys.stdin:
+    if line.strip() == "@data":
+        break
+print("ready", flush=True)
+for line in sys.stdin:
+    print(line.strip().rsplit(",", 5)[0].strip('"'), flush=True)
+'''
+STUB_COMMAND = [sys.executable, "-c", STUB_CLASSIFIER]
+
+
+class Token:
+    def __init__(self, tag):
+        self.tag_ = tag
+
+
+class Doc:
+    def __init__(self, text, starting_tag):
+        self.text = text
+        self.tokens = [Token(starting_tag)]
+
+    def __getitem__(self, item):
+        return self.tokens[item]
+
+
+def features(text):
+    return Features(text, "false", "false", "false", "NN")
+
+
+def test_features_are_extracted_in_memory():
+    extracted = extract_features(Doc('Yes, fly "me" to LAX?', "UH"))
+    assert extracted == Features("Yes, fly me to LAX?", "true", "true", "false", "UH")
+    assert format_instance(extracted) == '"Yes, fly me to LAX?",true,true,false,UH,?'
+    assert extract_features(Doc("hmm", "XYZ")).starting_pos == "X"
+
+
+def test_classifier_process_answers_batches_in_order():
+    process = ClassifierProcess(STUB_COMMAND)
+    try:
+        texts = ["utterance %i" % i for i in range(2 * act_classifier.BATCH_CHUNK + 3)]
+        assert process.classify([format_instance(features(text)) for text in texts]) == texts
+        assert process.classify([format_instance(features("again"))]) == ["again"]
+    finally:
+        process.close()
+    assert not process.alive()
+
+
+def test_concurrent_sessions_get_their_own_tags(monkeypatch):
+    monkeypatch.setattr(act_classifier, "classifier_command", lambda: STUB_COMMAND)
+    monkeypatch.setattr(act_classifier, "worker", None)
+    monkeypatch.setattr(act_classifier, "worker_retry_at", 0.)
+
+    def session(number):
+        for turn in range(50):
+            texts = ["session %i turn %i part %i" % (number, turn, part) for part in range(turn % 3 + 1)]
+            assert classify_features([features(text) for text in texts]) == texts
+        return number
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert sorted(executor.map(session, range(16))) == list(range(16))
+    act_classifier.worker.close()
+
+
+def test_failed_starts_are_retried_with_backoff(monkeypatch):
+    starts = []
+
+    def command():
+        starts.append(1)
+        return [sys.executable, "-c", "pass"] if len(starts) < 3 else STUB_COMMAND
+
+    monkeypatch.setattr(act_classifier, "classifier_command", command)
+    monkeypatch.setattr(act_classifier, "worker", None)
+    monkeypatch.setattr(act_classifier, "worker_retry_at", 0.)
+    monkeypatch.setattr(act_classifier, "worker_backoff", act_classifier.RETRY_BACKOFF)
+    assert act_classifier.get_worker() is None
+    assert act_classifier.get_worker() is None
+    assert len(starts) == 1
+    assert act_classifier.worker_backoff == 2 * act_classifier.RETRY_BACKOFF
+    # the backoff passed
+    act_classifier.worker_retry_at = 0.
+    assert act_classifier.get_worker() is None
+    act_classifier.worker_retry_at = 0.
+    process = act_classifier.get_worker()
+    try:
+        assert process is not None and len(starts) == 3
+        assert act_classifier.worker_backoff == act_classifier.RETRY_BACKOFF
+        assert act_classifier.get_worker() is process
+    finally:
+        process.close()
@@ -0,0 +1,72 @@
+import json, os
+
+from nlu import ResolveAirport
+from nlu.ResolveAirport import find_matches, find_matches_batch, resolve, matches_cache, cache_stats, warm_up, \
+    queries_from_python_list, queries_from_session_log
+
+TEST_DIRECTORY = os.path.dirname(__file__)
+
+
+def test_repeated_queries_hit_the_cache():
+    matches_cache.clear()
+    before = cache_stats()
+    matches = find_matches("Los Angeles")
+    matches.append(("XXX", 100.))
+    # differently cased queries share the entry and callers receive copies
+    assert find_matches("LOS ANGELES") == resolve("los angeles")
+    stats = cache_stats()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 1
+    assert 0 < stats["hit_rate"] <= 1
+
+
+def test_queries_differing_in_spacing_share_the_entry():
+    matches_cache.clear()
+    matches = find_matches("San  Francisco ")
+    hits = cache_stats()["hits"]
+    assert find_matches_batch(["san francisco", " SAN FRANCISCO"]) == [matches, matches]
+    assert cache_stats()["hits"] == hits + 1
+    assert warm_up(["San Francisco", "san  francisco"]) == 1
+
+
+def test_full_ranking_serves_limited_queries():
+    matches_cache.clear()
+    full = find_matches("Brussels")
+    hits = cache_stats()["hits"]
+    assert find_matches("brussels", limit=2) == full[:2]
+    assert cache_stats()["hits"] == hits + 1
+
+
+def test_changed_airport_file_clears_the_cache(monkeypatch):
+    find_matches("Dubai")
+    assert len(matches_cache) > 0
+    reloads = []
+    monkeypatch.setattr(ResolveAirport.airports, "changed", lambda: len(reloads) == 0)
+    monkeypatch.setattr(ResolveAirport, "reload", lambda: reloads.append(1) or matches_cache.clear())
+    find_matches("Dubai")
+    assert reloads == [1]
+    assert cache_stats()["entries"] == 1
+
+
+def test_warm_up_queries_from_cities_and_session_logs(tmp_path):
+    cities = queries_from_python_list(os.path.join(TEST_DIRECTORY, "test_dialog_questions.py"))
+    assert "Los Angeles" in cities and "New York" in cities
+
+    log = {"sessions": [{"turns": [
+        {"type": "question", "data": "Origin", "time": ""},
+        {"type": "input", "data": "Amsterdam", "time": ""},
+        {"type": "input", "data": str({"utterance": "amsterdam", "extracted": {"u_location": ["amsterdam"]}}),
+         "time": ""},
+        {"type": "question", "data": "Departure Date", "time": ""},
+        {"type": "input", "data": "tomorrow", "time": ""},
+        {"type": "input", "data": str({"utterance": "to berlin", "extracted": {"d_location": "berlin"}}),
+         "time": ""}
+    ]}]}
+    filename = os.path.join(str(tmp_path), "log-2016-12-09.json")
+    json.dump(log, open(filename, "w"))
+    queries = queries_from_session_log(filename)
+    assert queries == ["Amsterdam", "amsterdam", "berlin"]
+
+    matches_cache.clear()
+    assert warm_up(queries, processes=1) == 2
+    assert ("amsterdam", None) in matches_cache and ("berlin", None) in matches_cache
@@ -0,0 +1,65 @@
+import numpy as np
+
+from nlu import ResolveAirport
+from nlu.ResolveAirport import find_matches, find_matches_exhaustive, find_matches_batch, rank, scoring_rows, \
+    score_bounds, score_row, normalize_query
+
+from test.airport_samples import sample_queries, reference_rank, HARD_QUERIES
+
+TOP_K = 10
+
+# every tenth airport, pruned and exhaustive ranking are compared on these rows;
+# benchmark_airport_scoring.py compares them over the whole table
+SAMPLE_ROWS = np.arange(0, len(scoring_rows), 10)
+
+
+def test_score_bounds_are_upper_bounds():
+    for query in sample_queries() + HARD_QUERIES:
+        normalized = normalize_query(query)
+        bounds = score_bounds.bounds(normalized)
+        for i in range(0, len(scoring_rows), 37):
+            row_score = score_row(scoring_rows[i], normalized)
+            assert row_score is None or row_score <= bounds[i] * (1. + 1e-9), (query, i)
+
+
+def test_pruned_top_k_matches_exhaustive_ranking():
+    for query in sample_queries(num_airports=6, seed=1) + HARD_QUERIES:
+        assert rank(query, SAMPLE_ROWS, TOP_K) == rank(query, SAMPLE_ROWS, TOP_K, prune=False), query
+    # the true best airport of this query used to be cut off before scoring
+    ResolveAirport.matches_cache.clear()
+    assert find_matches("Kyle Airort", limit=TOP_K) == find_matches_exhaustive("Kyle Airort", limit=TOP_K)
+
+
+def test_unlimited_matches_are_the_full_ranking():
+    for query in sample_queries()[:3] + HARD_QUERIES:
+        assert rank(query, SAMPLE_ROWS) == rank(query, SAMPLE_ROWS, prune=False), query
+
+
+def test_normalized_scoring_matches_reference():
+    rows = ResolveAirport.available_options[::20]
+    for query in sample_queries() + ["Amsterdam", "los angeles international", ""]:
+        assert rank(query, range(0, len(scoring_rows), 20)) == reference_rank(query, rows), query
+
+
+def test_batch_matches_single_queries():
+    queries = sample_queries()
+    queries = queries + [query.upper() for query in queries[:2]]
+    expected = [find_matches(query) for query in queries]
+    # resolve in worker processes instead of reading the cache
+    ResolveAirport.matches_cache.clear()
+    assert find_matches_batch(queries, processes=2) == expected
+    assert find_matches_batch(queries[:2], processes=1) == expected[:2]
+    # later batches reuse the worker processes
+    pool = ResolveAirport._pool
+    assert pool is not None
+    ResolveAirport.matches_cache.clear()
+    assert find_matches_batch(queries, processes=2) == expected
+    assert ResolveAirport._pool is pool
+    ResolveAirport.close_pool()
+
+
+def test_limit_keeps_head_of_full_ranking():
+    for query in sample_queries()[:4] + ["amsterdam", "zzzz qqqq"]:
+        full = find_matches(query)
+        assert find_matches(query, limit=TOP_K) == full[:TOP_K], query
+        assert rank(query, SAMPLE_ROWS, 3, prune=False) == rank(query, SAMPLE_ROWS, prune=False)[:3], query
@@ -0,0 +1,33 @@
+from nlu.airport import find_airport_by_code
+from nlu.airport_registry import AirportRegistry, airports
+from nlu.ResolveAirport import find_matches
+
+AIRPORTS = [
+    {"Name": "Lowell Field", "Region": "Alaska", "Country": "United States", "City": "Anchor Point",
+     "Code": "", "GPS_Code": "00AK", "Size": 1},
+    {"Name": "Schiphol Airport", "Region": "North Holland", "Country": "Netherlands", "City": "Amsterdam",
+     "Code": "AMS", "GPS_Code": "EHAM", "Size": 3},
+    {"Name": "Amsterdam Heliport", "Region": "North Holland", "Country": "Netherlands", "City": "Amsterdam",
+     "Code": "AMS", "GPS_Code": "EHHA", "Size": 1},
+]
+
+
+def test_lookups_return_first_airport_in_file_order():
+    registry = AirportRegistry(AIRPORTS)
+    assert registry.find_by_code("ams") is AIRPORTS[1]
+    assert registry.find_by_gps_code("eHhA") is AIRPORTS[2]
+    assert registry.find_by_name("SCHIPHOL AIRPORT") is AIRPORTS[1]
+    # airports without code are not indexed by code
+    assert registry.find_by_code("") is None
+    assert registry.find_by_gps_code("00ak") is AIRPORTS[0]
+
+
+def test_code_lookups_agree_with_linear_scan():
+    for airport in airports.airports[::97]:
+        code = airport["Code"]
+        if code == "":
+            continue
+        first = next(row for row in airports.airports if row["Code"] == code)
+        assert find_airport_by_code(code.lower()) is first
+        if len(code) == 3:
+            assert find_matches(code) == [(code, 1)]
@@ -0,0 +1,36 @@
+import datetime
+
+from nlu.nlu import fast_date_tags
+
+# a Wednesday
+TODAY = datetime.date(2016, 12, 7)
+
+
+def value(text):
+    tags = fast_date_tags(text, TODAY)
+    assert tags is not None and len(tags) == 1, text
+    return tags[0]["value"]
+
+
+def test_simple_dates_are_resolved_like_sutime():
+    assert value("2016-12-24") == "2016-12-24"
+    assert value("tomorrow") == "2016-12-08"
+    assert value("I want to leave Today.") == "2016-12-07"
+    # weekdays lie in the week of today, parse_date moves past ones a week ahead
+    assert value("monday") == "2016-12-05"
+    assert value("on Friday please") == "2016-12-09"
+    assert value("next monday") == "2016-12-12"
+    assert value("in 3 days") == "2016-12-10"
+    assert value("returning in two days") == "2016-12-09"
+
+
+def test_offsets_match_the_utterance():
+    tags = fast_date_tags("fly back on next tuesday", TODAY)
+    assert tags == [{"text": "next tuesday", "type": "DATE", "value": "2016-12-13", "start": 12, "end": 24}]
+
+
+def test_undecided_utterances_go_to_sutime():
+    for text in ["", "to boston", "monday morning", "tomorrow at 5pm", "monday to friday",
+                 "fly to boston tomorrow", "december 9th", "the day after tomorrow", "in 3 weeks"]:
+        assert fast_date_tags(text, TODAY) is None, text
+
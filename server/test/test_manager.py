@@ -0,0 +1,155 @@
+import asyncio, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from dialogue.database import Database, AsyncDatabase
+from dialogue import manager as manager_module
+from dialogue.manager import Manager
+
+from test.test_table import FLIGHTS, create_fields
+
+
+class StaticDatabase(Database):
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def query(self, query):
+        self.queries.append(query)
+        return list(self.results)
+
+
+# flights for every route queried. With parallel set, each query waits until
+# that many queries run at once and fails if they never do.
+class RouteDatabase(Database):
+    def __init__(self, delay=0., parallel=None):
+        self.delay = delay
+        self.queries = []
+        self.barrier = None if parallel is None else threading.Barrier(parallel, timeout=5)
+
+    def query(self, query):
+        self.queries.append(query)
+        if self.barrier is not None:
+            self.barrier.wait()
+        time.sleep(self.delay)
+        return [dict(flight, origin=query["Origin"], destination=query["Destination"]) for flight in FLIGHTS]
+
+
+class AsyncRouteDatabase(AsyncDatabase):
+    def __init__(self, delay=0., parallel=None):
+        self.delay = delay
+        self.parallel = parallel
+        self.started = 0
+        self.routes = RouteDatabase()
+
+    async def query(self, query):
+        self.started += 1
+        if self.parallel is not None:
+            # the queries share one event loop, they only all start if none blocks it
+            for _ in range(500):
+                if self.started >= self.parallel:
+                    break
+                await asyncio.sleep(0.01)
+            else:
+                raise RuntimeError("%i of %i queries started" % (self.started, self.parallel))
+        await asyncio.sleep(self.delay)
+        return self.routes.query(query)
+
+
+def create_manager():
+    return Manager(create_fields(), ["Destination", "Origin", "Departure Date"], StaticDatabase(FLIGHTS))
+
+
+def inform(manager, attribute, values):
+    return list(manager.inform(attribute, values))
+
+
+def test_manager_filters_by_user_state():
+    manager = create_manager()
+    inform(manager, "Destination", [("AMS", 1)])
+    inform(manager, "Origin", [("LAX", 1)])
+    inform(manager, "Departure Date", [("2016-12-09", 1)])
+    assert len(manager.possible_data) == len(FLIGHTS)
+
+    inform(manager, "Carrier", [("dl", 1)])
+    assert manager.possible_data == [FLIGHTS[1], FLIGHTS[3]]
+    inform(manager, "Price", [("moderate", 1)])
+    assert manager.possible_data == [FLIGHTS[1], FLIGHTS[3]]
+    assert manager.next_question()[1] == {"DL": 2, "KL": 1}
+
+
+def test_manager_narrows_without_querying_for_filter_attributes(monkeypatch):
+    manager = create_manager()
+    inform(manager, "Destination", [("AMS", 1)])
+    inform(manager, "Origin", [("LAX", 1)])
+    inform(manager, "Departure Date", [("2016-12-09", 1)])
+    assert len(manager.database.queries) == 1
+    # filtering uses the field indexes over the results instead of building new ones
+    assert all(field.index.num_rows == len(FLIGHTS) for field in manager.available_fields.values())
+    monkeypatch.setattr(manager_module, "BitmapIndex", None)
+
+    inform(manager, "Price", [("cheap", 1)])
+    assert manager.possible_data == [FLIGHTS[0]]
+    # a changed filter is applied to all results in hand, not only the remaining ones
+    inform(manager, "Price", [("expensive", 1)])
+    assert manager.possible_data == [FLIGHTS[2]]
+    assert len(manager.database.queries) == 1
+    monkeypatch.undo()
+
+    inform(manager, "Departure Date", [("2016-12-10", 1)])
+    assert len(manager.database.queries) == 2
+    assert manager.database.queries[-1] == {"Destination": "AMS", "Origin": "LAX", "Departure Date": "2016-12-10"}
+
+
+def test_manager_queries_all_combinations_in_parallel():
+    manager = Manager(create_fields(), ["Destination", "Origin", "Departure Date"], RouteDatabase(parallel=4),
+                      executor=ThreadPoolExecutor(max_workers=4))
+    manager.user_state = {
+        "Destination": [("AMS", 1), ("RTM", 0.5)],
+        "Origin": [("LAX", 1), ("BUR", 0.5)],
+        "Departure Date": [("2016-12-09", 1)]
+    }
+    # the four queries wait for each other, so they only complete if they run at once
+    progress = list(manager.update())
+    assert len([line for line in progress if line.startswith("Received")]) == 4
+    assert len(manager.possible_data) == 4 * len(FLIGHTS)
+    # merged in query order regardless of completion order
+    assert [flight["origin"] for flight in manager.possible_data[:len(FLIGHTS)]] == ["LAX"] * len(FLIGHTS)
+
+
+def test_manager_stops_querying_at_max_data(monkeypatch):
+    monkeypatch.setattr(manager_module, "MAX_DATA", len(FLIGHTS))
+    database = RouteDatabase(delay=0.05)
+    manager = Manager(create_fields(), ["Destination", "Origin", "Departure Date"], database,
+                      executor=ThreadPoolExecutor(max_workers=1))
+    manager.user_state = {
+        "Destination": [("AMS", 1), ("RTM", 0.5), ("EIN", 0.3)],
+        "Origin": [("LAX", 1), ("BUR", 0.5)],
+        "Departure Date": [("2016-12-09", 1)]
+    }
+    list(manager.update())
+    manager.executor.shutdown(wait=True)
+    assert len(manager.possible_data) == 2 * len(FLIGHTS)
+    assert len(database.queries) < 6
+    assert manager.queried_state is None
+
+
+def test_async_database_query_many_keeps_order():
+    database = AsyncRouteDatabase()
+    queries = [{"Origin": origin, "Destination": "AMS"} for origin in ["LAX", "BUR", "SFO"]]
+    results = asyncio.new_event_loop().run_until_complete(database.query_many(queries))
+    assert [result[0]["origin"] for result in results] == ["LAX", "BUR", "SFO"]
+
+
+def test_manager_drives_async_database():
+    manager = Manager(create_fields(), ["Destination", "Origin", "Departure Date"], AsyncRouteDatabase(delay=0.05, parallel=4))
+    sleeps = []
+    manager.sleep = lambda seconds: sleeps.append(seconds) or time.sleep(seconds)
+    manager.user_state = {
+        "Destination": [("AMS", 1), ("RTM", 0.5)],
+        "Origin": [("LAX", 1), ("BUR", 0.5)],
+        "Departure Date": [("2016-12-09", 1)]
+    }
+    list(manager.update())
+    assert len(manager.possible_data) == 4 * len(FLIGHTS)
+    # waiting for the queries went through the pluggable sleep
+    assert len(sleeps) > 0
@@ -0,0 +1,57 @@
+import re
+
+from nlu.nlu import ParsedUtterance, find_in_doc, determine_outbound_inbound, detect_iata, \
+    detect_cabin_class, detect_qualifiers
+
+
+class Token:
+    def __init__(self, orth, idx, tag="NN", lemma=None):
+        self.orth_ = orth
+        self.idx = idx
+        self.tag_ = tag
+        self.lemma_ = lemma or orth.lower()
+        self.head = self
+        self.ancestors = []
+
+
+class Doc:
+    def __init__(self, text, tags=None):
+        self.text = text
+        self.ents = []
+        self.tokens = [Token(match.group(), match.start()) for match in re.finditer(r"\S+", text)]
+        for token, tag in zip(self.tokens, tags or []):
+            token.tag_ = tag
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def __getitem__(self, item):
+        return self.tokens[item]
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+def test_tokens_are_collected_in_one_pass():
+    doc = Doc("Cheapest flight from AMS to LAX, business", ["JJS", "NN", "IN", "NNP", "TO", "NNP", "NN"])
+    parsed = ParsedUtterance(doc)
+    assert [token.orth_ for token in parsed.iata_tokens] == ["AMS", "LAX,"]
+    assert parsed.comparatives == {"cheapest"}
+    assert parsed.stripped[5] == "LAX"
+    assert detect_iata(parsed) == {"u_location": ["AMS", "LAX"]}
+    assert detect_cabin_class(parsed) == {"cabin_class": "BUSINESS"}
+    assert detect_qualifiers(parsed) == {"qualifiers": ["cheapest"]}
+
+
+def test_date_tokens_are_found_by_offset():
+    doc = Doc("monday, return on monday")
+    parsed = ParsedUtterance(doc)
+    # like parsing the first word of the tag, the first token with its text is found
+    assert find_in_doc(parsed, 18) is doc.tokens[0]
+    assert find_in_doc(parsed, 11) is doc.tokens[1]
+    assert determine_outbound_inbound(parsed, {"start": 18, "text": "monday"}) is None
+    doc.tokens[0].ancestors = [doc.tokens[1]]
+    assert determine_outbound_inbound(parsed, {"start": 18, "text": "monday"}) == "inbound"
+    # the prepositions before the date decide if it has no verb ancestor
+    assert determine_outbound_inbound(ParsedUtterance(Doc("I fly on friday")),
+                                      {"start": 9, "text": "friday"}) == "outbound"
@@ -0,0 +1,54 @@
+import datetime
+
+from nlu import nlu
+from nlu.nlu import ExtractCache
+
+
+class Clock:
+    def __init__(self):
+        self.day = datetime.date(2016, 12, 5)
+
+    def today(self):
+        return self.day
+
+
+def create_cache():
+    calls = []
+
+    def extract_info(utterance):
+        calls.append(utterance)
+        return {"dialog_act": "statement", "u_location": [utterance]}
+
+    def extract_info_batch(utterances):
+        return [{"dialog_act": utterance.strip(".!").lower()} for utterance in utterances]
+
+    clock = Clock()
+    return ExtractCache(extract_info, extract_info_batch, today=clock.today), calls, clock
+
+
+def test_repeated_utterances_are_answered_from_the_cache():
+    cache, calls, clock = create_cache()
+    first = cache.extract_info("to  LAX ")
+    first["u_location"].append("changed")
+    assert cache.extract_info("to LAX") == {"dialog_act": "statement", "u_location": ["to LAX"]}
+    assert calls == ["to LAX"]
+    clock.day += datetime.timedelta(days=1)
+    cache.extract_info("to LAX")
+    assert calls == ["to LAX", "to LAX"]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["hit_rate"] == 1 / 3
+
+
+def test_one_word_answers_come_from_the_table():
+    cache, calls, clock = create_cache()
+    # before the table is built answers go through the cache
+    cache.extract_info("Yes!")
+    assert calls == ["Yes!"]
+    cache.build_answer_table()
+    assert len(cache.answer_table) == len(nlu.ANSWER_UTTERANCES)
+    clock.day += datetime.timedelta(days=1)
+    assert cache.extract_info(" Yes! ") == {"dialog_act": "yes"}
+    assert cache.extract_info("economy") == {"dialog_act": "economy"}
+    cache.extract_info("YES")
+    assert calls == ["Yes!", "YES"]
+    assert cache.stats()["answer_table_hits"] == 2
@@ -0,0 +1,65 @@
+import threading
+
+from nlu.service import NLUService, NOT_LOADED, READY, FAILED
+
+
+def test_preload_loads_once_in_the_background():
+    release = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(threading.current_thread().name)
+        release.wait(5)
+
+    service = NLUService(load, lambda: {"hits": 1})
+    assert service.status()["state"] == NOT_LOADED
+    assert "cache" not in service.status()
+    service.preload()
+    service.preload()
+    assert not service.loaded() and not service.ready()
+    release.set()
+    assert service.wait(5)
+    service.preload()
+    assert loads == ["nlu-preload"]
+    status = service.status()
+    assert status["state"] == READY and status["error"] is None and status["load_seconds"] >= 0
+    assert status["cache"] == {"hits": 1}
+
+
+def test_failed_load_is_reported():
+    def load():
+        raise IOError("no model")
+
+    service = NLUService(load)
+    assert not service.wait(5)
+    assert service.loaded()
+    assert service.status()["state"] == FAILED
+    assert "no model" in service.status()["error"]
+    try:
+        service.extract_info("to boston")
+        assert False, "extract_info should fail without models"
+    except RuntimeError as e:
+        assert "no model" in str(e)
+
+
+def test_warm_up_runs_after_the_models_are_ready():
+    started = threading.Event()
+    release = threading.Event()
+    states = []
+
+    def warm_up():
+        states.append(service.state)
+        started.set()
+        release.wait(5)
+
+    service = NLUService(lambda: None, warm_up=warm_up)
+    # ready while the warm-up is still running
+    assert service.wait(5)
+    assert started.wait(5)
+    assert states == [READY]
+    release.set()
+
+    warm_ups = []
+    service = NLUService(lambda: 1 / 0, warm_up=lambda: warm_ups.append(1))
+    assert not service.wait(5)
+    assert warm_ups == []
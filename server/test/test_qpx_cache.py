@@ -0,0 +1,69 @@
+import json, os
+
+from qpx.cache import ResponseCache, request_key, CACHE_EXTENSION
+from qpx.lru import LRUCache, approximate_size
+
+REQUEST = {
+    "request": {
+        "passengers": {"adultCount": 1},
+        "slice": [{"date": "2016-12-09", "origin": "LAX", "destination": "AMS"}]
+    }
+}
+RESPONSE = {"kind": "qpxExpress#tripsSearch", "trips": {"tripOption": []}}
+
+
+def test_lru_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", "A", size=40)
+    cache.put("b", "B", size=40)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", size=40)
+    assert "b" not in cache
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 80
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_lru_skips_values_larger_than_budget():
+    cache = LRUCache(max_bytes=10)
+    cache.put("small", 1, size=5)
+    cache.put("huge", 2, size=50)
+    assert "huge" not in cache
+    assert cache.get("small") == 1
+
+
+def test_approximate_size_counts_nested_values():
+    flat = approximate_size({"price": "USD100.00"})
+    nested = approximate_size({"price": "USD100.00", "slices": [{"duration": 100, "legs": ["x" * 1000]}]})
+    assert nested > flat + 1000
+
+
+def test_request_key_ignores_key_order():
+    reordered = {"request": {"slice": [{"destination": "AMS", "origin": "LAX", "date": "2016-12-09"}],
+                             "passengers": {"adultCount": 1}}}
+    assert request_key(reordered) == request_key(REQUEST)
+
+
+def test_response_cache_put_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get(request_key(REQUEST)) == (None, None)
+    file = cache.put(REQUEST, RESPONSE)
+    assert file == request_key(REQUEST) + CACHE_EXTENSION
+    # a fresh cache finds the response by file name alone
+    response, _ = ResponseCache(str(tmp_path)).get(request_key(REQUEST))
+    assert response == RESPONSE
+
+
+def test_response_cache_migrates_legacy_files(tmp_path):
+    legacy = dict(REQUEST, response=RESPONSE)
+    json.dump(legacy, open(os.path.join(str(tmp_path), "legacy.json"), "w"), indent=4)
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get(request_key(REQUEST))[1] == "legacy.json"
+    assert cache.migrate() == 1
+    assert os.listdir(str(tmp_path)) == [request_key(REQUEST) + CACHE_EXTENSION]
+    assert cache.get(request_key(REQUEST))[0] == RESPONSE
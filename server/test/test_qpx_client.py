@@ -0,0 +1,110 @@
+import asyncio, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from qpx import qpx
+from qpx.cache import ResponseCache, request_key, CACHE_EXTENSION
+from qpx.singleflight import SingleFlight
+from qpx_database import AsyncQPXDatabase
+
+from test.qpx_stub import StubQPXServer, EMPTY_RESPONSE
+
+REQUEST = {
+    "request": {
+        "passengers": {"adultCount": 1},
+        "slice": [{"date": "2016-12-09", "origin": "LAX", "destination": "AMS"}]
+    }
+}
+
+
+def use_stub(monkeypatch, tmp_path, server, **session_options):
+    monkeypatch.setattr(qpx, "QPX_URL", server.url)
+    monkeypatch.setattr(qpx, "_api_key", "test-key")
+    monkeypatch.setattr(qpx, "_session", qpx.create_session(**session_options))
+    monkeypatch.setattr(qpx, "response_cache", ResponseCache(str(tmp_path)))
+
+
+def request_for(date):
+    return {"request": dict(REQUEST["request"], slice=[dict(REQUEST["request"]["slice"][0], date=date)])}
+
+
+def test_requests_reuse_one_connection(monkeypatch, tmp_path):
+    with StubQPXServer() as server:
+        use_stub(monkeypatch, tmp_path, server)
+        for day in range(1, 6):
+            assert qpx.get_flights(request_for("2016-12-%02i" % day)) == EMPTY_RESPONSE
+        assert len(server.requests) == 5
+        assert len(server.connections) == 1
+
+
+def test_failed_requests_are_retried(monkeypatch, tmp_path):
+    with StubQPXServer(failures=2) as server:
+        use_stub(monkeypatch, tmp_path, server, retries=3, backoff=0.01)
+        assert qpx.get_flights(REQUEST) == EMPTY_RESPONSE
+        assert len(server.requests) == 3
+        # the response is cached, asking again does not reach the server
+        assert qpx.get_flights(REQUEST) == EMPTY_RESPONSE
+        assert len(server.requests) == 3
+
+
+def test_gives_up_after_retries(monkeypatch, tmp_path):
+    with StubQPXServer(failures=10) as server:
+        use_stub(monkeypatch, tmp_path, server, retries=1, backoff=0.01)
+        assert qpx.get_flights(REQUEST) is None
+        assert len(server.requests) == 2
+
+
+def test_concurrent_identical_requests_share_one_call(monkeypatch, tmp_path):
+    with StubQPXServer(latency=0.3) as server:
+        use_stub(monkeypatch, tmp_path, server)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda _: qpx.get_flights(REQUEST), range(8)))
+        assert responses == [EMPTY_RESPONSE] * 8
+        assert len(server.requests) == 1
+        assert os.listdir(str(tmp_path)) == [request_key(REQUEST) + CACHE_EXTENSION]
+
+
+def test_cache_writes_are_idempotent(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    file = cache.put(REQUEST, EMPTY_RESPONSE)
+    modified = os.path.getmtime(os.path.join(str(tmp_path), file))
+    time.sleep(0.01)
+    assert cache.put(REQUEST, EMPTY_RESPONSE) == file
+    assert os.path.getmtime(os.path.join(str(tmp_path), file)) == modified
+    assert os.listdir(str(tmp_path)) == [file]
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("QPX down")
+
+    def follow():
+        started.wait()
+        return flight.do("key", lambda: "not called")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        follower = executor.submit(follow)
+        with pytest.raises(ValueError):
+            flight.do("key", fail)
+        with pytest.raises(ValueError):
+            follower.result()
+    assert flight.in_flight() == 0
+
+
+def test_async_database_queries_in_the_executor(monkeypatch):
+    database = AsyncQPXDatabase(executor=ThreadPoolExecutor(max_workers=2))
+    threads = []
+    monkeypatch.setattr(database.database, "query",
+                        lambda query: threads.append(threading.current_thread()) or [query["Origin"]])
+
+    async def query_all():
+        return await asyncio.gather(*[database.query({"Origin": origin}) for origin in ["LAX", "BUR"]])
+
+    assert asyncio.new_event_loop().run_until_complete(query_all()) == [["LAX"], ["BUR"]]
+    assert threading.current_thread() not in threads
@@ -6,21 +6,24 @@ import matplotlib.pyplot as plt
 from matplotlib import cm
 from matplotlib import gridspec
 
-from server.nlu.airport import available_airports
-from server.nlu.ResolveAirport import find_matches
+from nlu.airport import available_airports
+from nlu.ResolveAirport import find_matches_batch
 import random
 
 
 def test_country_city(airports, remove_characters=1):
     avg_position = 0
+    queries = []
     for airport in airports:
-        found = False
         query = "{City:s}, {Country:s}".format(**airport)
         for i in range(remove_characters):
             remove = random.randint(0, len(query))
             query = query[:remove] + query[remove+1:]
+        queries.append(query)
+    for airport, query, matches in zip(airports, queries, find_matches_batch(queries)):
+        found = False
         print("Query: \"%s\"" % query)
-        for position, (code, score) in enumerate(find_matches(query)):
+        for position, (code, score) in enumerate(matches):
             if code == airport["Code"]:
                 print("Found airport %s at position %i." % (code, position))
                 yield position
@@ -35,14 +38,17 @@ def test_country_city(airports, remove_characters=1):
 
 def test_city(airports, remove_characters=1):
     avg_position = 0
+    queries = []
     for airport in airports:
-        found = False
         query = airport["City"]
         for i in range(remove_characters):
             remove = random.randint(0, len(query))
             query = query[:remove] + query[remove+1:]
+        queries.append(query)
+    for airport, query, matches in zip(airports, queries, find_matches_batch(queries)):
+        found = False
         print("Query: \"%s\"" % query)
-        for position, (code, score) in enumerate(find_matches(query)):
+        for position, (code, score) in enumerate(matches):
             if code == airport["Code"]:
                 print("Found airport %s at position %i." % (code, position))
                 yield position
@@ -57,14 +63,17 @@ def test_city(airports, remove_characters=1):
 
 def test_name(airports, remove_characters=1):
     avg_position = 0
+    queries = []
     for airport in airports:
-        found = False
         query = airport["Name"]
         for i in range(remove_characters):
             remove = random.randint(0, len(query))
             query = query[:remove] + query[remove+1:]
+        queries.append(query)
+    for airport, query, matches in zip(airports, queries, find_matches_batch(queries)):
+        found = False
         print("Query: \"%s\"" % query)
-        for position, (code, score) in enumerate(find_matches(query)):
+        for position, (code, score) in enumerate(matches):
             if code == airport["Code"]:
                 print("Found airport %s at position %i." % (code, position))
                 yield position
@@ -156,6 +165,8 @@ if __name__ == '__main__':
     results = {
         "experiments": []
     }
+    # shuffle a copy, the order of the shared airport list is used by the airport indexes
+    available_airports = list(available_airports)
     random.shuffle(available_airports)
     sample_size = 20
     for size in range(1, 4):
@@ -0,0 +1,28 @@
+import spacy
+
+from nlu import act_classifier, config, nlu
+from nlu.nlu import load_spacy, SPACY_OPTIONAL_COMPONENTS
+from test.profile_extract_info import UTTERANCES
+
+
+def test_only_configured_components_are_loaded(monkeypatch):
+    calls = []
+    monkeypatch.setattr(spacy, "load", lambda name, **overrides: calls.append((name, overrides)))
+    load_spacy()
+    assert calls == [(config.SPACY_MODEL, {"matcher": False, "add_vectors": False})]
+    try:
+        load_spacy(components=("tagger", "ner"))
+        assert False, "unknown components should be rejected"
+    except ValueError as e:
+        assert "ner" in str(e)
+
+
+# extract_info gives the same results with the trimmed pipeline as with all components
+def test_trimmed_pipeline_keeps_extract_info_output():
+    nlu.load()
+    full = load_spacy(components=tuple(SPACY_OPTIONAL_COMPONENTS))
+    for utterance, tags in zip(UTTERANCES, nlu.tag_times(UTTERANCES)):
+        trimmed_doc, full_doc = nlu.nlp(utterance), full(utterance)
+        assert act_classifier.extract_features(trimmed_doc) == act_classifier.extract_features(full_doc)
+        assert nlu.analyze(utterance, trimmed_doc, "statement", tags) == \
+            nlu.analyze(utterance, full_doc, "statement", tags), utterance
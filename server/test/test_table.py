@@ -0,0 +1,73 @@
+import re, sys
+
+import numpy as np
+
+from dialogue.field import Field, NumField, NumCategory
+from dialogue.table import Table, BitmapIndex
+
+FLIGHTS = [
+    {"origin": "LAX", "destination": "AMS", "departureDate": "2016-12-09", "nonstop": True,
+     "price": "USD180.00", "carriers": ["KL"], "cabins": ["COACH"]},
+    {"origin": "LAX", "destination": "AMS", "departureDate": "2016-12-09", "nonstop": False,
+     "price": "USD620.50", "carriers": ["DL", "KL"], "cabins": ["COACH"]},
+    {"origin": "LAX", "destination": "AMS", "departureDate": "2016-12-09", "nonstop": False,
+     "price": "USD2100.00", "carriers": ["UA", "LH"], "cabins": ["BUSINESS", "COACH"]},
+    {"origin": "LAX", "destination": "AMS", "departureDate": "2016-12-09", "nonstop": True,
+     "price": "USD990.00", "carriers": ["DL"], "cabins": ["FIRST"]},
+]
+
+
+def create_fields():
+    return [
+        Field("Destination", ["destination"]),
+        Field("Origin", ["origin"]),
+        Field("Departure Date", ["departureDate"]),
+        Field("NonStop", ["nonstop"]),
+        NumField("Price",
+                 ["price"],
+                 [NumCategory("cheap", 0, 250),
+                  NumCategory("moderate", 250, 1400),
+                  NumCategory("expensive", 1400, sys.maxsize)],
+                 lambda raw: float(re.match(r".*?([0-9\.]+)", raw).group(1))),
+        Field("Carrier", ["carriers"]),
+        Field("Cabin Class", ["cabins"])
+    ]
+
+
+def test_table_counts_match_row_scan():
+    fields = create_fields()
+    table = Table.from_entries(FLIGHTS, fields)
+    for field in fields:
+        assert field.category_count(table) == dict(field.category_count(FLIGHTS))
+        assert abs(field.entropy(table) - field.entropy(FLIGHTS)) < 1e-12
+
+
+def test_table_take_and_concat():
+    fields = create_fields()
+    table = Table.from_entries(FLIGHTS, fields)
+    carrier = table.column("Carrier")
+    mask = carrier.matches(["dl"], len(table))
+    assert list(mask) == [False, True, False, True]
+    subset = table.take(mask)
+    assert subset.rows == [FLIGHTS[1], FLIGHTS[3]]
+    assert fields[5].category_count(subset) == {"DL": 2, "KL": 1}
+    np.testing.assert_array_equal(subset.column("Price").values, [620.5, 990.])
+
+    merged = Table.concat([subset, table.take(~mask)], fields)
+    assert len(merged) == len(FLIGHTS)
+    for field in fields:
+        assert field.category_count(merged) == dict(field.category_count(FLIGHTS))
+
+
+def test_bitmap_index_selects_rows():
+    fields = create_fields()
+    table = Table.from_entries(FLIGHTS, fields)
+    index = BitmapIndex.from_column(table.column("Carrier"), len(table))
+    assert index.categories() == {"kl", "dl", "ua", "lh"}
+    assert list(index.mask(index.any_of(["KL", "ua"]))) == [True, True, True, False]
+    assert not index.mask(index.any_of(["BA"])).any()
+
+    cabin = fields[6]
+    cabin.update(table)
+    bits = index.any_of(["dl"]) & cabin.index.any_of(["coach"])
+    assert list(index.mask(bits)) == [False, True, False, False]
@@ -0,0 +1,100 @@
+import datetime, re, sys
+
+from nlu import time_tagging
+from nlu.time_tagging import parse_batch, java_length, TimeTagger, TaggerWorker
+
+# tags weekdays like SUTime, "friday monday" as one range even across lines
+TIME_EXPRESSION = re.compile(r"(friday\s+monday|monday|tuesday|friday|tomorrow)")
+
+
+class FakeTagger:
+    def __init__(self):
+        self.calls = []
+
+    def parse(self, text):
+        self.calls.append(text)
+        return [{"text": match.group(), "start": java_length(text[:match.start()]),
+                 "end": java_length(text[:match.end()]), "type": "DATE", "value": match.group().upper()}
+                for match in TIME_EXPRESSION.finditer(text)]
+
+
+# answers like a tagger process, tagging the whole text and failing on "fail"
+STUB_TAGGER = '''
+import json, os, sys
+print("ready", flush=True)
+for line in sys.stdin:
+    text = json.loads(line)
+    if text == "fail":
+        print(json.dumps({"error": "ValueError: fail"}), flush=True)
+    else:
+        print(json.dumps([{"text": text, "start": 0, "end": len(text), "pid": os.getpid()}]), flush=True)
+'''
+STUB_COMMAND = [sys.executable, "-c", STUB_TAGGER]
+
+
+TEXTS = ["fly on monday", "", "no dates here", "back tomorrow \U0001F600 or tuesday",
+         "monday", "leaving friday", "to boston tuesday"]
+
+
+def test_batch_tags_equal_single_tags():
+    tagger = FakeTagger()
+    expected = [tagger.parse(text) for text in TEXTS]
+    tagger.calls = []
+    assert parse_batch(tagger.parse, TEXTS, chunk=3) == expected
+    assert len(tagger.calls) == 3
+
+
+def test_tags_across_utterances_are_tagged_one_by_one():
+    tagger = FakeTagger()
+    texts = ["leaving friday", "monday"]
+    expected = [tagger.parse(text) for text in texts]
+    tagger.calls = []
+    assert parse_batch(tagger.parse, texts) == expected
+    # the joined call found "friday\n\nmonday" and was repeated per text
+    assert tagger.calls == [time_tagging.SEPARATOR.join(texts)] + texts
+
+    tagger.calls = []
+    texts = ["two lines\n\non friday", "monday"]
+    assert parse_batch(tagger.parse, texts) == [tagger.parse(text) for text in texts]
+    assert tagger.calls == texts * 2
+
+
+def test_tags_are_cached_per_text_and_day():
+    tagger = FakeTagger()
+    days = [datetime.date(2016, 12, 5)]
+    cached = TimeTagger(tagger.parse, today=lambda: days[0])
+    monday = tagger.parse("monday")
+    assert cached.parse("monday") == monday
+    tagger.calls = []
+    # surrounding whitespace shifts the offsets, but the stripped text is cached
+    shifted = cached.parse("  monday ")
+    assert shifted == FakeTagger().parse("  monday ")
+    shifted[0]["value"] = "changed"
+    assert cached.parse("monday")[0]["value"] == "MONDAY"
+    assert cached.parse_batch(["no dates", "monday", "no dates"]) == [[], monday, []]
+    assert tagger.calls == ["no dates"]
+    assert cached.stats()["hits"] == 3
+
+    tagger.calls = []
+    days[0] = datetime.date(2016, 12, 6)
+    cached.parse("monday")
+    assert tagger.calls == ["monday"]
+
+
+def test_worker_recycles_its_process():
+    worker = TaggerWorker(STUB_COMMAND, recycle_after=3)
+    try:
+        tags = [worker.parse("text %i" % i) for i in range(5)]
+        assert [tag[0]["text"] for tag in tags] == ["text %i" % i for i in range(5)]
+        pids = [tag[0]["pid"] for tag in tags]
+        assert pids[0] == pids[2] != pids[3] == pids[4]
+        try:
+            worker.parse("fail")
+            assert False, "the error of the tagger process should be raised"
+        except RuntimeError as e:
+            assert "ValueError: fail" in str(e)
+        worker.process.process.kill()
+        worker.process.process.wait()
+        assert worker.parse("after exit")[0]["pid"] != pids[4]
+    finally:
+        worker.recycle()